@@ -0,0 +1,94 @@
+"""Compare roll_many against rolling an expression one roll at a time
+
+Usage: python -m benchmarks.bench_dice [--rolls N] [expression ...]
+
+Two per-roll baselines are timed: "original" re-implements the pre-series
+Dice.roll (re.findall on every roll, one random.randint per die and a
+per-roll description string, without the prompts and prints), and
+"compiled" calls the cached single-roll path of compile_expression. The
+original only understood XdY terms and flat modifiers, so it is skipped
+for keep/drop, exploding and reroll expressions.
+"""
+import argparse
+import random
+import re
+import time
+
+from ttrpg_tools import dice
+
+
+DEFAULT_EXPRESSIONS = ["1d20+5", "2d20kh1+7", "4d6dl1", "8d6", "1d6!"]
+
+
+def original_roll(dice_input, rng):
+    """The original Dice.roll for one roll: parse, roll each die, describe; returns (total, description)"""
+    dice_patterns = re.findall(r"(\d*)d(\d+)", dice_input, re.IGNORECASE)
+    modifier = sum(int(sign + number) for sign, number in re.findall(r"([+-])\s*(\d+)(?![\dd])", dice_input))
+    total_rolls = []
+    grand_total = 0
+    for num, sides in dice_patterns:
+        num_dice = int(num) if num else 1
+        dice_sides = int(sides)
+        rolls = [rng.randint(1, dice_sides) for _ in range(num_dice)]
+        total_rolls.append(f"{num_dice}d{dice_sides}: {', '.join(map(str, rolls))}")
+        grand_total += sum(rolls)
+    return grand_total + modifier, " | ".join(total_rolls)
+
+
+def supported_by_original(expression):
+    """True if the original Dice.roll could roll the expression (plain XdY terms and modifiers)"""
+    return not any(term.keep or term.explode or term.reroll for term in dice.compile_expression(expression)._dice)
+
+
+def time_original(expression, rolls):
+    """Roll one expression at a time with the original implementation"""
+    rng = random.Random(0)
+    start = time.perf_counter()
+    totals = [original_roll(expression, rng)[0] for _ in range(rolls)]
+    return time.perf_counter() - start, totals
+
+
+def time_compiled(expression, rolls):
+    """Roll one expression at a time through the compiled single-roll path"""
+    compiled = dice.compile_expression(expression)
+    rng = random.Random(0)
+    start = time.perf_counter()
+    totals = [compiled.total(rng) for _ in range(rolls)]
+    return time.perf_counter() - start, totals
+
+
+def time_batch(expression, rolls):
+    """Roll all of the expressions in one roll_many call"""
+    start = time.perf_counter()
+    totals = dice.roll_many(expression, rolls, random.Random(0))
+    return time.perf_counter() - start, totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("expressions", nargs="*", default=DEFAULT_EXPRESSIONS)
+    parser.add_argument("--rolls", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    backend = "numpy" if dice.numpy_module() is not None else "stdlib array"
+    print(f"roll_many backend: {backend}, {args.rolls:,} rolls per expression")
+    print(f"{'expression':<14}{'original (s)':>13}{'compiled (s)':>13}{'batch (s)':>11}"
+          f"{'vs original':>13}{'vs compiled':>13}{'batch mean':>12}")
+    for expression in args.expressions:
+        if supported_by_original(expression):
+            original_time, _ = time_original(expression, args.rolls)
+            original = f"{original_time:>13.3f}"
+        else:
+            original_time = None
+            original = f"{'n/a':>13}"
+        compiled_time, _ = time_compiled(expression, args.rolls)
+        batch_time, batch_totals = time_batch(expression, args.rolls)
+        speedup = f"{original_time / batch_time:>12.1f}x" if original_time else f"{'n/a':>13}"
+        print(
+            f"{expression:<14}{original}{compiled_time:>13.3f}{batch_time:>11.3f}"
+            f"{speedup}{compiled_time / batch_time:>12.1f}x{sum(batch_totals) / args.rolls:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Measure how parallel generation scales with the number of worker processes
+
+Usage: python -m benchmarks.bench_parallel [--count N] [--workers 1 2 4 ...]
+
+Also checks that every worker count produces exactly the same output.
+"""
+import argparse
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from ttrpg_tools import parallel
+from ttrpg_tools.location_generator import LOCATION_DATA_NAME, LocationNameGenerator, draw_location_names
+from ttrpg_tools.name_generator import NameGenerator, draw_names
+from ttrpg_tools.title_generator import TitleGenerator, draw_titles
+
+
+def workloads(data_dir):
+    """(label, draw, table) for each generator"""
+    with redirect_stdout(None):
+        names = NameGenerator(os.path.join(data_dir, "fantasy_names.json"))
+        titles = TitleGenerator(os.path.join(data_dir, "fantasy_titles.json"))
+        locations = LocationNameGenerator(
+            os.path.join(data_dir, LOCATION_DATA_NAME),
+            os.path.join(data_dir, "fantasy_locations_history.json"),
+        )
+        locations.history.close()
+    return [
+        ("dice 8d6", parallel.roll_totals, "8d6"),
+        ("elf names", draw_names, names.get_race_table("elf")),
+        ("complex titles", draw_titles, titles.tables[("complex", "negative")]),
+        ("locations", draw_location_names, locations.tables),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2_000_000)
+    parser.add_argument("--workers", type=int, nargs="*")
+    parser.add_argument("--shard-size", type=int, default=parallel.SHARD_SIZE)
+    args = parser.parse_args(argv)
+
+    cpus = parallel.default_workers()
+    worker_counts = args.workers or sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+    print(f"{cpus} CPUs available, {args.count:,} results per run, shards of {args.shard_size:,}")
+    print(f"{'workload':<16}{'workers':>8}{'seconds':>10}{'speedup':>9}{'efficiency':>12}")
+
+    # Generators create default data files when missing, so never touch the real ones
+    with tempfile.TemporaryDirectory() as data_dir:
+        for label, draw, table in workloads(data_dir):
+            baseline = expected = None
+            for workers in worker_counts:
+                start = time.perf_counter()
+                results = parallel.generate(draw, table, args.count, seeds=1, workers=workers, shard_size=args.shard_size)
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                expected = expected or results
+                match = "" if results == expected else "  OUTPUT DIFFERS"
+                print(f"{label:<16}{workers:>8}{elapsed:>10.3f}{baseline / elapsed:>8.2f}x"
+                      f"{baseline / elapsed / workers:>11.0%}{match}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Measure PDF random-table rendering throughput in pages per second
+
+Usage: python -m benchmarks.bench_pdf [--pages N] [--die 100]
+
+Renders d100 name, title and location tables until the requested number of
+pages is reached, separating generation time from layout and writing time.
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from ttrpg_tools.location_generator import LocationNameGenerator
+from ttrpg_tools.name_generator import NameGenerator
+from ttrpg_tools.pdf import TablePDF, iter_compendium_tables
+from ttrpg_tools.title_generator import TitleGenerator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--die", type=int, default=100)
+    parser.add_argument("--no-compress", action="store_true", help="write uncompressed content streams")
+    args = parser.parse_args(argv)
+
+    # Generators create default data files when missing, so never touch the real ones
+    with tempfile.TemporaryDirectory() as directory:
+        with redirect_stdout(None):
+            names = NameGenerator(os.path.join(directory, "names.json"), rng=1)
+            titles = TitleGenerator(os.path.join(directory, "titles.json"), rng=2)
+            locations = LocationNameGenerator(os.path.join(directory, "locations.json"), os.path.join(directory, "history.json"), rng=3)
+            locations.history.close()
+        tables = iter_compendium_tables(names, titles, locations, die=args.die)
+
+        path = os.path.join(directory, "compendium.pdf")
+        generating = 0.0
+        start = time.perf_counter()
+        with open(path, 'wb') as file, TablePDF(file, "Benchmark Compendium", compress=not args.no_compress) as pdf:
+            while pdf.page_count < args.pages:
+                started = time.perf_counter()
+                title, rows = next(tables)
+                generating += time.perf_counter() - started
+                pdf.add_table(title, rows)
+        elapsed = time.perf_counter() - start
+        pages = len(pdf.writer.pages)
+        size = os.path.getsize(path)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{pages} pages ({size / 1e6:.1f} MB) in {elapsed:.2f} s: {pages / elapsed:,.0f} pages/s")
+    print(f"generation {generating:.2f} s, layout and writing {elapsed - generating:.2f} s "
+          f"({pages / (elapsed - generating):,.0f} pages/s)")
+    print(f"peak memory {peak:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Measure cold-start import time with python -X importtime and enforce a budget
+
+Usage: python -m benchmarks.bench_startup [--runs N] [--budget-ms MS] [module ...]
+
+Exits with status 1 if the median cumulative import time of any module is
+over the budget, so it can be used as a check before merging.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+DEFAULT_MODULES = ["ttrpg_tools.menu", "ttrpg_tools.cli"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module):
+    """Import module in a fresh interpreter and return {module: (self_us, cumulative_us)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            times[name] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure(module, runs):
+    """Median cumulative import time (ms) of module and the slowest imports of the last run"""
+    totals = []
+    for _ in range(runs):
+        times = import_times(module)
+        totals.append(times[module][1] / 1000)
+    slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:5]
+    return statistics.median(totals), slowest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=60.0, help="maximum median cumulative import time")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    print(f"{'module':<24}{'median (ms)':>12}  slowest imports (self ms)")
+    for module in args.modules:
+        median, slowest = measure(module, args.runs)
+        details = ", ".join(f"{name} {self_us / 1000:.1f}" for name, (self_us, _) in slowest)
+        print(f"{module:<24}{median:>12.1f}  {details}")
+        if median > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Over the {args.budget_ms:g} ms startup budget: {', '.join(over_budget)}")
+        return 1
+    print(f"All modules within the {args.budget_ms:g} ms startup budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
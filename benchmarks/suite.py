@@ -0,0 +1,198 @@
+"""Throughput and latency of every generator hot path, with baseline comparison
+
+Usage:
+    python -m benchmarks.suite                                # shipped data plus 1k/10k/100k synthetic
+    python -m benchmarks.suite --sizes shipped 1000 -o results.json
+    python -m benchmarks.suite --save-baseline                # record benchmarks/baseline.json
+    python -m benchmarks.suite --compare                      # exit 1 on regressions
+
+Each case is called repeatedly for at least --min-time seconds. Results are
+keyed "<case>[<data size>]" and hold calls, items per second and p50/p95
+latency per call in microseconds.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from itertools import count
+
+from benchmarks.synthetic import write_dataset
+from ttrpg_tools import dice
+from ttrpg_tools.location_generator import LOCATION_DATA_NAME, LocationNameGenerator
+from ttrpg_tools.name_generator import NameGenerator
+from ttrpg_tools.registry import registry
+from ttrpg_tools.title_generator import TitleGenerator
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = ["shipped", "1000", "10000", "100000"]
+
+
+def measure(operation, items=1, min_time=0.2, max_samples=2000):
+    """Call operation until min_time has passed and summarize the timings.
+
+    Fast operations are timed in groups of calls long enough for the clock
+    to resolve. Throughput comes from the fastest group, as timeit
+    recommends, so interference from the rest of the machine does not swing
+    comparisons; the percentiles show the latency actually seen.
+    """
+    clock = time.perf_counter
+    per_sample = 1
+    while True:
+        start = clock()
+        for _ in range(per_sample):
+            operation()
+        if clock() - start >= 50e-6 or per_sample >= 1 << 16:
+            break
+        per_sample *= 4
+
+    latencies = []
+    started = clock()
+    while len(latencies) < max_samples:
+        start = clock()
+        for _ in range(per_sample):
+            operation()
+        end = clock()
+        latencies.append((end - start) / per_sample)
+        if end - started >= min_time and len(latencies) >= 3:
+            break
+    latencies.sort()
+    return {
+        "calls": len(latencies) * per_sample,
+        "items_per_sec": items / latencies[0] if latencies[0] else float("inf"),
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p95_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1e6,
+    }
+
+
+def dice_cases():
+    """(name, operation, items) for the dice engine, which does not depend on data size"""
+    # More distinct expressions than the parse cache holds, so every parse is a miss
+    expressions = [f"{n}d{sides}+{bonus}" for n in range(1, 11) for sides in (4, 6, 8, 10, 12, 20) for bonus in range(20)]
+    uncached = count()
+    rng = dice.make_batch_rng(1)
+    return [
+        ("dice.parse", lambda: dice.Dice(expressions[next(uncached) % len(expressions)]), 1),
+        ("dice.roll", lambda: dice.Dice("4d6dl1+2", rng).roll(), 1),
+        ("dice.roll_many", lambda: dice.roll_many("8d6", 10000, rng), 10000),
+    ]
+
+
+def generator_cases(directory):
+    """(name, operation, items) for the generators loaded from directory"""
+    names_file = os.path.join(directory, "fantasy_names.json")
+    locations_file = os.path.join(directory, LOCATION_DATA_NAME)
+    history_file = os.path.join(directory, "fantasy_locations_history.json")
+    names = NameGenerator(names_file, rng=1)
+    titles = TitleGenerator(os.path.join(directory, "fantasy_titles.json"), rng=1)
+    locations = LocationNameGenerator(locations_file, history_file, rng=1)
+    race = names.get_available_races()[0]
+
+    def cold(path, load):
+        def operation():
+            registry.invalidate(path)
+            load()
+        return operation
+
+    saved = count()
+    return [
+        ("names.generate_name", lambda: names.generate_name(race), 1),
+        ("names.generate_multiple_names", lambda: names.generate_multiple_names(race, 1000), 1000),
+        ("titles.generate_title.simple", lambda: titles.generate_title("simple", "positive"), 1),
+        ("titles.generate_title.complex", lambda: titles.generate_title("complex", "negative"), 1),
+        ("locations.generate_location_name", lambda: locations.generate_location_name(), 1),
+        ("names.save_races", names.save_races, 1),
+        ("names.load_races", cold(names_file, names.load_races), 1),
+        ("locations.load_location_data", cold(locations_file, locations.load_location_data), 1),
+        ("locations.save_name_history", lambda: locations.save_generated_name(f"Bench {next(saved)}", ["bench"]), 1),
+        ("locations.load_name_history", cold(history_file, locations.load_name_history), 1),
+    ], locations
+
+
+def run(sizes, min_time):
+    """Run every case for every data size and return the results document"""
+    results = {}
+
+    def record(name, size, operation, items):
+        key = f"{name}[{size}]"
+        results[key] = measure(operation, items, min_time)
+        result = results[key]
+        print(f"{key:<48}{result['items_per_sec']:>14,.0f}{result['p50_us']:>12.1f}{result['p95_us']:>12.1f}", file=sys.stderr)
+
+    print(f"{'case':<48}{'items/s':>14}{'p50 (us)':>12}{'p95 (us)':>12}", file=sys.stderr)
+    for name, operation, items in dice_cases():
+        record(name, "-", operation, items)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            write_dataset(directory, size)
+            with redirect_stdout(None):  # the generators report every load and save
+                cases, locations = generator_cases(directory)
+                try:
+                    for name, operation, items in cases:
+                        record(name, size, operation, items)
+                finally:
+                    locations.history.close()
+                    registry.invalidate()
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": dice.numpy_module() is not None,
+        "results": results,
+    }
+
+
+def compare(document, baseline, tolerance):
+    """Print the change against the baseline and return the regressed case keys"""
+    regressions = []
+    print(f"{'case':<48}{'baseline/s':>14}{'now/s':>14}{'change':>9}")
+    for key, result in document["results"].items():
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        change = result["items_per_sec"] / before["items_per_sec"] - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<48}{before['items_per_sec']:>14,.0f}{result['items_per_sec']:>14,.0f}{change:>+9.0%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="*", default=DEFAULT_SIZES, help="'shipped' or a number of components per data file")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to spend on each case")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline results file")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against the baseline, exiting 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    document = run(args.sizes, args.min_time)
+    if args.output:
+        with open(args.output, 'w', encoding="utf-8") as file:
+            json.dump(document, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding="utf-8") as file:
+            json.dump(document, file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    if args.compare:
+        with open(args.baseline, 'r', encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(document, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Synthetic generator data files of a chosen size, for benchmarking"""
+import os
+import random
+import shutil
+
+from ttrpg_tools.location_generator import LOCATION_DATA_NAME
+from ttrpg_tools.storage import save_data
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SYLLABLES = ["ka", "el", "dor", "ith", "mar", "th", "ae", "wyn", "gor", "ul", "sil", "ran", "bel", "vor", "ia", "en"]
+
+
+def words(rng, count, syllables=3):
+    """count pseudo-words of up to syllables syllables"""
+    return ["".join(rng.choices(SYLLABLES, k=rng.randint(1, syllables))).capitalize() for _ in range(count)]
+
+
+def split(total, parts):
+    """Split total into parts near-equal sizes (at least 1 each)"""
+    return [max(1, total // parts + (i < total % parts)) for i in range(parts)]
+
+
+def name_data(size, rng):
+    """Race data with about size components spread over 10 races"""
+    sizes = split(size, 20)
+    return {
+        f"race{i}": {"prefixes": words(rng, sizes[2 * i]), "suffixes": [w.lower() for w in words(rng, sizes[2 * i + 1])]}
+        for i in range(10)
+    }
+
+
+def title_data(size, rng):
+    """Title data with about size components"""
+    sizes = split(size, 7)
+    return {
+        "simple": {
+            "positive": [f"The {w}" for w in words(rng, sizes[0])],
+            "negative": [f"The {w}" for w in words(rng, sizes[1])],
+        },
+        "complex": {
+            "positive": {"prefixes": [f"The {w}" for w in words(rng, sizes[2])], "locations": [f"of {w}" for w in words(rng, sizes[3])]},
+            "negative": {
+                "prefixes": [f"The {w}" for w in words(rng, sizes[4])],
+                "creations": [f"of the {w}" for w in words(rng, sizes[5])],
+                "origins": [f"from {w}" for w in words(rng, sizes[6])],
+            },
+        },
+    }
+
+
+def location_data(size, rng):
+    """Location data with about size components"""
+    sizes = split(size, 7)
+    return {
+        "terrain": {"generic": words(rng, sizes[0]), "mountain": words(rng, sizes[1]), "water": words(rng, sizes[2])},
+        "prefixes": {"mystical": words(rng, sizes[3]), "geographical": words(rng, sizes[4])},
+        "suffixes": {"abstract": words(rng, sizes[5]), "historical": words(rng, sizes[6])},
+    }
+
+
+def history_data(size, rng):
+    """A saved-name history with size entries"""
+    tags = ["coast", "capital", "ruin", "dungeon", "village"]
+    return {
+        "saved_names": [
+            {"name": " ".join(words(rng, 3, 2)), "timestamp": f"2025-01-01T00:00:{i % 60:02d}.{i:06d}", "tags": rng.sample(tags, 2)}
+            for i in range(size)
+        ],
+        "journal": 0,
+    }
+
+
+def write_dataset(directory, size):
+    """Write the four data files to directory; size 'shipped' copies the repository's data"""
+    os.makedirs(directory, exist_ok=True)
+    if size == "shipped":
+        for name in ("fantasy_names.json", "fantasy_titles.json", LOCATION_DATA_NAME, "fantasy_locations_history.json"):
+            shutil.copy(os.path.join(DATA_DIR, name), os.path.join(directory, name))
+        return directory
+
+    size = int(size)
+    rng = random.Random(size)
+    save_data(name_data(size, rng), os.path.join(directory, "fantasy_names.json"))
+    save_data(title_data(size, rng), os.path.join(directory, "fantasy_titles.json"))
+    save_data(location_data(size, rng), os.path.join(directory, LOCATION_DATA_NAME))
+    save_data(history_data(min(size, 10000), rng), os.path.join(directory, "fantasy_locations_history.json"))
+    return directory
@@ -1,9 +1,18 @@
+import os
+
 from ttrpg_tools.menu import Menu
 
 
 def main():
-    menu = Menu()
-    menu.input_loop()
+    seed = os.environ.get("TTRPG_SEED")
+    menu = Menu(seed=int(seed) if seed else None)
+    profile = os.environ.get("TTRPG_PROFILE")
+    if profile:
+        from ttrpg_tools.instrument import profiled
+        with profiled(profile):
+            menu.input_loop()
+    else:
+        menu.input_loop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
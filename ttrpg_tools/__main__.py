@@ -0,0 +1,6 @@
+import sys
+
+from ttrpg_tools.cli import main
+
+
+sys.exit(main())
@@ -0,0 +1,399 @@
+"""Non-interactive command line interface for the generators.
+
+Examples:
+    python -m ttrpg_tools roll 1d20+5 -n 1000000 --seed 7 > totals.txt
+    python -m ttrpg_tools names elf -n 100 --unique --format csv
+    python -m ttrpg_tools titles --complexity complex --sentiment negative -n 20
+    python -m ttrpg_tools locations --terrain water -n 50 --format jsonl -o coast.jsonl
+    python -m ttrpg_tools names dwarf -n 100 -o dwarf_names.md
+    python -m ttrpg_tools names elf -n 50000000 --workers 8 --seed 1 -o elves.txt
+    python -m ttrpg_tools encounters --party 4x5 --difficulty hard --terrain mountain -n 10
+    python -m ttrpg_tools loot --terrain mountain --level 7 -n 40 --format jsonl
+    python -m ttrpg_tools pdf compendium.pdf --die 100 --tables 1000
+    python -m ttrpg_tools serve --port 8000
+    python -m ttrpg_tools --metrics metrics.json --profile names.pstats names elf -n 1000000 > /dev/null
+"""
+import argparse
+import contextlib
+import os
+import sys
+from itertools import chain, islice
+
+from ttrpg_tools.export import FORMATS, detect_export_format, export, open_output
+from ttrpg_tools.instrument import timed_chunks
+from ttrpg_tools.rng import SeedStream, make_rng
+
+
+CHUNK_SIZE = 10000
+
+
+def build_parser():
+    """Build the argument parser with one subcommand per generator"""
+    parser = argparse.ArgumentParser(prog="ttrpg_tools", description="Generate TTRPG content without the menus.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    def add_output_options(subparser, count=True):
+        if count:
+            subparser.add_argument("-n", "--count", type=int, default=1, help="how many results to generate")
+            subparser.add_argument("--workers", type=int, default=1, help="generate on this many processes (0 for one per CPU); seeded output is the same for any number")
+        subparser.add_argument("--seed", type=int, help="seed for reproducible output")
+        subparser.add_argument("--format", choices=FORMATS, help="output format (default: from the -o file name, else text)")
+        subparser.add_argument("-o", "--output", help="write to this file instead of stdout")
+
+    roll = subcommands.add_parser("roll", help="roll a dice expression")
+    roll.add_argument("expression", help="dice expression, e.g. 1d20+5 or 4d6kh3")
+    roll.add_argument("--detail", action="store_true", help="include individual dice, not just totals")
+    add_output_options(roll)
+
+    odds = subcommands.add_parser("odds", help="exact statistics for a dice expression")
+    odds.add_argument("expression", help="dice expression, e.g. 2d20kh1+7")
+    odds.add_argument("--dc", type=int, action="append", default=[], help="print the chance of meeting this DC (repeatable)")
+
+    names = subcommands.add_parser("names", help="generate character names")
+    names.add_argument("race", help="race to generate names for")
+    names.add_argument("--unique", action="store_true", help="never repeat a name")
+    names.add_argument("--markov", action="store_true", help="invent new names in the race's style instead of combining parts")
+    add_output_options(names)
+
+    titles = subcommands.add_parser("titles", help="generate titles")
+    titles.add_argument("--complexity", choices=("simple", "complex"), default="simple")
+    titles.add_argument("--sentiment", choices=("positive", "negative"), default="positive")
+    titles.add_argument("--unique", action="store_true", help="never repeat a title")
+    add_output_options(titles)
+
+    locations = subcommands.add_parser("locations", help="generate location names")
+    locations.add_argument("--terrain", help="terrain category (random if omitted)")
+    locations.add_argument("--unique", action="store_true", help="never repeat a location name")
+    add_output_options(locations)
+
+    encounters = subcommands.add_parser("encounters", help="build random encounters for a party")
+    encounters.add_argument("--party", required=True, help="character levels, e.g. '3,3,4,5' or '4x5' (four level 5 characters)")
+    encounters.add_argument("--difficulty", choices=("easy", "medium", "hard", "deadly"), default="medium")
+    encounters.add_argument("--terrain", help="terrain category of the location generator (any if omitted)")
+    encounters.add_argument("--type", action="append", dest="types", help="only monsters of this type (repeatable)")
+    encounters.add_argument("--min-cr", help="weakest challenge rating to include, e.g. 1/2")
+    encounters.add_argument("--max-cr", help="strongest challenge rating to include")
+    encounters.add_argument("--max-monsters", type=int, default=8)
+    encounters.add_argument("--monsters", help="monster data file, JSON or CSV (default: monsters.json in the data directory)")
+    add_output_options(encounters)
+
+    loot = subcommands.add_parser("loot", help="roll treasure hoards")
+    loot.add_argument("--terrain", help="terrain category of the location generator (default: generic)")
+    loot.add_argument("--level", type=int, default=1, help="party level")
+    loot.add_argument("--loot-file", help="loot table file (default: loot_tables.json in the data directory)")
+    add_output_options(loot)
+
+    pdf = subcommands.add_parser("pdf", help="print random tables to a PDF")
+    pdf.add_argument("output", help="PDF file to write")
+    pdf.add_argument("--kinds", nargs="+", choices=("names", "titles", "locations", "loot"), default=["names", "titles", "locations"])
+    pdf.add_argument("--die", type=int, default=100, help="rows per table (the die to roll on it)")
+    pdf.add_argument("--tables", type=int, help="number of tables (default: one of each race, title kind and terrain)")
+    pdf.add_argument("--page-size", choices=("letter", "a4"), default="letter")
+    pdf.add_argument("--title", default="Random Tables")
+    pdf.add_argument("--seed", type=int, help="seed for reproducible output")
+
+    import_names = subcommands.add_parser("import-names", help="add a list of names to a race's Markov training data")
+    import_names.add_argument("race", help="race the names belong to")
+    import_names.add_argument("names_file", help="text file with one name per line")
+
+    migrate = subcommands.add_parser("migrate-history", help="copy a JSON saved-name history into SQLite")
+    migrate.add_argument("json_file", help="existing JSON history file")
+    migrate.add_argument("db_file", help="SQLite database to create or append to")
+
+    serve = subcommands.add_parser("serve", help="serve the generators as a local JSON web API")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for the whole network)")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--seed", type=int, help="seed for reproducible output")
+
+    parser.add_argument("--data-dir", default="data", help="directory holding the generator data files")
+    parser.add_argument("--metrics", nargs="?", const="text", default=os.environ.get("TTRPG_METRICS"),
+                        help="record call counts and timings and report them on exit: text, json or a file name")
+    parser.add_argument("--profile", default=os.environ.get("TTRPG_PROFILE"), help="run under cProfile and write the stats to this .pstats file")
+    return parser
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    """Split an iterable into lists of at most size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def repeat_chunks(make_one, count, size=CHUNK_SIZE):
+    """Chunks of count results of make_one()"""
+    for start in range(0, count, size):
+        yield [make_one() for _ in range(min(size, count - start))]
+
+
+def location_file(data_dir):
+    """The location data file in data_dir"""
+    from ttrpg_tools.location_generator import LOCATION_DATA_NAME
+    return os.path.join(data_dir, LOCATION_DATA_NAME)
+
+
+def primed(chunks):
+    """The chunks with the first one already generated, so errors surface before any output is written"""
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    return iter(()) if first is None else chain([first], chunks)
+
+
+def quietly(factory, *args, **kwargs):
+    """Construct a generator with its status messages sent to stderr"""
+    with contextlib.redirect_stdout(sys.stderr):
+        return factory(*args, **kwargs)
+
+
+def use_shards(args):
+    """Shard the batch on several workers, or whenever a seed is given, so seeded output is the same for any --workers"""
+    return args.workers != 1 or (args.seed is not None and not getattr(args, "unique", False))
+
+
+def parallel_chunks(args, draw, table, rng):
+    """Shards generated on args.workers processes"""
+    from ttrpg_tools import parallel
+    if getattr(args, "unique", False):
+        raise ValueError("--unique cannot be combined with --workers.")
+    return parallel.iter_shards(draw, table, args.count, rng, args.workers or None)
+
+
+def roll_chunks(args, rng):
+    from ttrpg_tools import dice
+    compiled = dice.compile_expression(args.expression)
+    if use_shards(args) and not args.detail:
+        from ttrpg_tools.parallel import roll_totals
+        return parallel_chunks(args, roll_totals, compiled.expression, rng), "total"
+    if args.detail:
+        rng = make_rng(rng)
+        if args.format == "jsonl":
+            return repeat_chunks(lambda: compiled.roll(rng).to_dict(), args.count), "result"
+        return repeat_chunks(lambda: format_roll(compiled.roll(rng)), args.count), "result"
+    rng = dice.make_batch_rng(rng)
+    sizes = (min(CHUNK_SIZE, args.count - start) for start in range(0, args.count, CHUNK_SIZE))
+    return (dice.roll_many(compiled, size, rng).tolist() for size in sizes), "total"
+
+
+def format_roll(result):
+    """One-line description of a RollResult"""
+    return f"{' | '.join(map(str, result.terms))} = {result.total}"
+
+
+def name_chunks(args, rng):
+    from ttrpg_tools.name_generator import NameGenerator, draw_names
+    generator = quietly(NameGenerator, os.path.join(args.data_dir, "fantasy_names.json"), rng=rng)
+    if args.markov:
+        if args.unique:
+            raise ValueError("--unique cannot be combined with --markov.")
+        sampler = generator.get_markov_sampler(args.race)
+        if sampler is None:
+            raise ValueError(generator.unknown_race_message(args.race))
+        if use_shards(args):
+            from ttrpg_tools.markov import draw_markov_names
+            return parallel_chunks(args, draw_markov_names, sampler.model, rng), "name"
+        sizes = (min(CHUNK_SIZE, args.count - start) for start in range(0, args.count, CHUNK_SIZE))
+        return (sampler.generate_many(size) for size in sizes), "name"
+    table = generator.get_race_table(args.race)
+    if table is None:
+        raise ValueError(generator.unknown_race_message(args.race))
+    if use_shards(args):
+        return parallel_chunks(args, draw_names, table, rng), "name"
+    if args.unique:
+        return chunked(generator.iter_unique_names(args.race, args.count)), "name"
+    return generator.iter_name_chunks(args.race, args.count, CHUNK_SIZE), "name"
+
+
+def title_chunks(args, rng):
+    from ttrpg_tools.title_generator import TitleGenerator, draw_titles
+    generator = quietly(TitleGenerator, os.path.join(args.data_dir, "fantasy_titles.json"), rng=rng)
+    if use_shards(args):
+        parts = generator.tables.get((args.complexity, args.sentiment))
+        return parallel_chunks(args, draw_titles, parts, rng), "title"
+    if args.unique:
+        return chunked(generator.iter_unique_titles(args.complexity, args.sentiment, args.count)), "title"
+    return repeat_chunks(lambda: generator.generate_title(args.complexity, args.sentiment), args.count), "title"
+
+
+def location_chunks(args, rng):
+    from functools import partial
+    from ttrpg_tools.location_generator import LocationNameGenerator, draw_location_names
+    generator = quietly(
+        LocationNameGenerator,
+        location_file(args.data_dir),
+        os.path.join(args.data_dir, "fantasy_locations_history.json"),
+        rng=rng,
+    )
+    generator.history.close()
+    if args.terrain and args.terrain not in generator.tables.terrain:
+        raise ValueError(f"Unknown terrain '{args.terrain}'. Choose from: {', '.join(generator.tables.terrain_categories)}.")
+    if use_shards(args):
+        return parallel_chunks(args, partial(draw_location_names, terrain=args.terrain), generator.tables, rng), "location"
+    if args.unique:
+        return chunked(generator.iter_unique_location_names(args.terrain, args.count)), "location"
+    return repeat_chunks(lambda: generator.generate_location_name(args.terrain), args.count), "location"
+
+
+def encounter_chunks(args, rng):
+    from ttrpg_tools.encounter import EncounterBuilder, parse_party
+    if args.workers != 1:
+        raise ValueError("--workers is not supported for encounters.")
+    builder = quietly(
+        EncounterBuilder,
+        args.monsters or os.path.join(args.data_dir, "monsters.json"),
+        location_file(args.data_dir),
+        rng=rng,
+    )
+    if not len(builder.index):
+        raise ValueError("No monsters are available.")
+    solver = builder.solver(parse_party(args.party), args.difficulty, args.terrain, args.types, args.min_cr, args.max_cr, args.max_monsters)
+    if not solver:
+        raise ValueError(f"No {args.difficulty} encounter fits that party with the chosen filters.")
+    rng = builder.rng
+    if args.format in ("csv", "jsonl"):
+        return repeat_chunks(lambda: solver.draw(rng).to_dict(), args.count), "encounter"
+    return repeat_chunks(lambda: str(solver.draw(rng)), args.count), "encounter"
+
+
+def loot_chunks(args, rng):
+    from ttrpg_tools.loot import LootGenerator
+    if args.workers != 1:
+        raise ValueError("--workers is not supported for loot; hoards are already rolled in vectorized batches.")
+    generator = quietly(
+        LootGenerator,
+        args.loot_file or os.path.join(args.data_dir, "loot_tables.json"),
+        location_file(args.data_dir),
+        rng=rng,
+    )
+    generator.hoard_table(args.terrain, args.level)  # report a bad terrain or level before any output
+    convert = (lambda hoard: hoard.to_dict()) if args.format in ("csv", "jsonl") else str
+    sizes = (min(CHUNK_SIZE, args.count - start) for start in range(0, args.count, CHUNK_SIZE))
+    return ([convert(hoard) for hoard in generator.roll_hoards(args.terrain, args.level, size)] for size in sizes), "hoard"
+
+
+GENERATORS = {
+    "roll": roll_chunks,
+    "names": name_chunks,
+    "titles": title_chunks,
+    "locations": location_chunks,
+    "encounters": encounter_chunks,
+    "loot": loot_chunks,
+}
+
+
+def write_pdf(args):
+    from ttrpg_tools import pdf
+    from ttrpg_tools.location_generator import LocationNameGenerator
+    from ttrpg_tools.name_generator import NameGenerator
+    from ttrpg_tools.title_generator import TitleGenerator
+    if args.die < 1:
+        raise ValueError("--die must be at least 1.")
+    seeds = SeedStream(args.seed)
+    generators = {}
+    if "names" in args.kinds:
+        generators["name_generator"] = quietly(NameGenerator, os.path.join(args.data_dir, "fantasy_names.json"), rng=seeds.child("names"))
+    if "titles" in args.kinds:
+        generators["title_generator"] = quietly(TitleGenerator, os.path.join(args.data_dir, "fantasy_titles.json"), rng=seeds.child("titles"))
+    if "locations" in args.kinds:
+        locations = quietly(
+            LocationNameGenerator,
+            location_file(args.data_dir),
+            os.path.join(args.data_dir, "fantasy_locations_history.json"),
+            rng=seeds.child("locations"),
+        )
+        locations.history.close()
+        generators["location_generator"] = locations
+    if "loot" in args.kinds:
+        from ttrpg_tools.loot import LootGenerator
+        generators["loot_generator"] = quietly(
+            LootGenerator,
+            os.path.join(args.data_dir, "loot_tables.json"),
+            location_file(args.data_dir),
+            rng=seeds.child("loot"),
+        )
+
+    tables = pdf.iter_compendium_tables(die=args.die, **generators)
+    if args.tables is None:
+        kinds = sum((
+            len(generators["name_generator"].get_available_races()) if "name_generator" in generators else 0,
+            len(generators["title_generator"].tables) if "title_generator" in generators else 0,
+            len(generators["location_generator"].tables.terrain_categories) if "location_generator" in generators else 0,
+            sum(map(len, generators["loot_generator"].tables.hoards.values())) if "loot_generator" in generators and generators["loot_generator"].tables else 0,
+        ))
+        tables = islice(tables, kinds)
+    else:
+        tables = islice(tables, args.tables)
+    pages = pdf.write_tables_pdf(tables, args.output, args.title, args.page_size)
+    print(f"Wrote {pages} pages to {args.output}", file=sys.stderr)
+
+
+def print_odds(args):
+    from ttrpg_tools import dice
+    distribution = dice.distribution(args.expression)
+    print(f"{dice.compile_expression(args.expression).expression}: min {distribution.minimum}, max {distribution.maximum}")
+    print(f"mean {distribution.mean():.3f}, standard deviation {distribution.stddev():.3f}")
+    print("percentiles: " + ", ".join(f"{q}%: {distribution.percentile(q)}" for q in (10, 25, 50, 75, 90)))
+    for dc in args.dc:
+        print(f"P(total >= {dc}) = {distribution.prob_at_least(dc):.4f}")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        # Before any tool is imported, so their functions get instrumented
+        from ttrpg_tools.instrument import metrics
+        metrics.enable(args.metrics)
+    if args.profile:
+        from ttrpg_tools.instrument import profiled
+        with profiled(args.profile):
+            return run_command(args)
+    return run_command(args)
+
+
+def run_command(args):
+    """Run the chosen subcommand and return the exit status"""
+    try:
+        if args.command == "odds":
+            print_odds(args)
+            return 0
+        if args.command == "migrate-history":
+            from ttrpg_tools.history import migrate_json_history
+            count = migrate_json_history(args.json_file, args.db_file)
+            print(f"Migrated {count} saved names to {args.db_file}", file=sys.stderr)
+            return 0
+
+        if args.command == "import-names":
+            from ttrpg_tools.name_generator import NameGenerator
+            generator = quietly(NameGenerator, os.path.join(args.data_dir, "fantasy_names.json"))
+            with open(args.names_file, 'r', encoding="utf-8") as file:
+                message = generator.import_names(args.race, file.read().splitlines())
+            print(message, file=sys.stderr)
+            return 0 if message.startswith("Imported") else 2
+        if args.command == "pdf":
+            write_pdf(args)
+            return 0
+        if args.command == "serve":
+            from ttrpg_tools.server import run
+            run(args.host, args.port, args.data_dir, args.seed)
+            return 0
+
+        args.format = args.format or (detect_export_format(args.output) if args.output else "text")
+        rng = SeedStream(args.seed) if args.seed is not None else None
+        chunks, field = GENERATORS[args.command](args, rng)
+        chunks = timed_chunks(f"cli.{args.command}.chunk", chunks)
+        # Check capacity, races, etc. before opening (and truncating) the output or writing a header
+        chunks = primed(chunks)
+        with open_output(args.output) as out:
+            export(chunks, out, args.format, field, die=args.count)
+
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head); stop quietly
+        sys.stdout = None
+        return 0
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    return 0
@@ -1,46 +1,711 @@
 import random
 import re
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import accumulate
+from math import exp, lgamma, log, sqrt
+
+from ttrpg_tools.instrument import timed
+from ttrpg_tools.rng import make_numpy_rng, make_rng, numpy_module
+
+
+MAX_DICE = 1000
+MAX_SIDES = 10000
+EXPLODE_LIMIT = 20
+BATCH_CELLS = 1 << 20  # dice drawn per chunk by roll_many
+FFT_THRESHOLD = 64  # shortest operand length before convolutions switch to FFT
+MAX_DISTRIBUTION_COST = 3 * 10**8  # distribution_cost limit (about a second)
+CACHED_DISTRIBUTION_WIDTH = 4096  # larger distributions are not kept in the cache
+
+_PHRASES = re.compile(r"\s*\b(keep|drop)\s+(highest|lowest)\b\s*(\d*)")
+_TOKENS = re.compile(r"\d+|kh|kl|dh|dl|k|d|%|!|r|\+|-")
+
+
+class DiceError(ValueError):
+    """Raised when a dice expression cannot be compiled"""
+
+
+class DiceTerm:
+    """A group of identical dice, e.g. 4d6kh3 or 1d6!"""
+    __slots__ = ("sign", "count", "sides", "keep", "explode", "reroll")
+
+    def __init__(self, sign, count, sides, keep=None, explode=False, reroll=0):
+        self.sign = sign
+        self.count = count
+        self.sides = sides
+        self.keep = keep  # None or ("h" | "l", number of dice kept)
+        self.explode = explode
+        self.reroll = reroll
+
+    def label(self):
+        """Canonical text for this term, without its sign"""
+        text = f"{self.count}d{self.sides}"
+        if self.reroll:
+            text += f"r{self.reroll}"
+        if self.explode:
+            text += "!"
+        if self.keep:
+            text += f"k{self.keep[0]}{self.keep[1]}"
+        return text
+
+    def roll_dice(self, rng):
+        """Roll every die of the term and return the individual values"""
+        random_ = rng.random
+        sides = self.sides
+        if not self.reroll and not self.explode:
+            return [int(random_() * sides) + 1 for _ in range(self.count)]
+
+        rolls = []
+        for _ in range(self.count):
+            value = int(random_() * sides) + 1
+            if value <= self.reroll:
+                value = int(random_() * sides) + 1
+            if self.explode:
+                face = value
+                depth = 0
+                while face == sides and depth < EXPLODE_LIMIT:
+                    face = int(random_() * sides) + 1
+                    value += face
+                    depth += 1
+            rolls.append(value)
+        return rolls
+
+    def kept(self, rolls):
+        """Return the rolls that count towards the total"""
+        if not self.keep:
+            return rolls
+        mode, number = self.keep
+        ordered = sorted(rolls, reverse=(mode == "h"))
+        return ordered[:number]
+
+    def batch_totals_numpy(self, generator, rows):
+        """Roll the term `rows` times at once and return the kept sums as an array"""
+        sides = self.sides
+        rolls = generator.integers(1, sides + 1, size=(rows, self.count))
+        if self.reroll:
+            mask = rolls <= self.reroll
+            rolls[mask] = generator.integers(1, sides + 1, size=int(mask.sum()))
+        if self.explode:
+            live = rolls == sides
+            depth = 0
+            while depth < EXPLODE_LIMIT and live.any():
+                faces = generator.integers(1, sides + 1, size=int(live.sum()))
+                rolls[live] += faces
+                live[live] = faces == sides
+                depth += 1
+        if self.keep:
+            mode, number = self.keep
+            rolls.sort(axis=1)
+            rolls = rolls[:, -number:] if mode == "h" else rolls[:, :number]
+        return rolls.sum(axis=1)
+
+    def batch_totals_stdlib(self, rng, rows):
+        """Roll the term `rows` times and return the kept sums as a list"""
+        if self.reroll or self.explode or self.keep:
+            kept = self.kept
+            roll_dice = self.roll_dice
+            return [sum(kept(roll_dice(rng))) for _ in range(rows)]
+        draws = rng.choices(range(1, self.sides + 1), k=rows * self.count)
+        if self.count == 1:
+            return draws
+        return list(map(sum, zip(*[iter(draws)] * self.count)))
+
+
+class ConstantTerm:
+    """A flat modifier such as +5"""
+    __slots__ = ("sign", "value")
+
+    def __init__(self, sign, value):
+        self.sign = sign
+        self.value = value
+
+    def label(self):
+        """Canonical text for this term, without its sign"""
+        return str(self.value)
+
+
+class TermResult:
+    """The outcome of a single term in a roll"""
+    __slots__ = ("label", "sign", "rolls", "kept", "total")
+
+    def __init__(self, label, sign, rolls, kept, total):
+        self.label = label
+        self.sign = sign
+        self.rolls = rolls
+        self.kept = kept
+        self.total = total
+
+    def __str__(self):
+        sign = "-" if self.sign < 0 else "+"
+        if self.rolls is None:
+            return f"({sign}{self.label})"
+        return f"{sign}{self.label}: {', '.join(map(str, self.rolls))}".lstrip("+")
+
+
+class RollResult:
+    """Structured result of rolling a compiled expression"""
+    __slots__ = ("expression", "total", "terms")
+
+    def __init__(self, expression, total, terms):
+        self.expression = expression
+        self.total = total
+        self.terms = terms
+
+    def to_dict(self):
+        """Return the result as plain data (e.g. for JSON output)"""
+        return {
+            "expression": self.expression,
+            "total": self.total,
+            "terms": [
+                {"term": term.label, "sign": term.sign, "rolls": term.rolls, "kept": term.kept, "total": term.total}
+                for term in self.terms
+            ],
+        }
+
+    def __str__(self):
+        return f"Rolling: {self.expression}\n{' | '.join(map(str, self.terms))}\nTotal: {self.total}"
+
+
+class CompiledRoll:
+    """A parsed dice expression that can be rolled many times"""
+    __slots__ = ("expression", "terms", "_dice", "_flat")
+
+    def __init__(self, terms):
+        self.terms = tuple(terms)
+        self.expression = _render(self.terms)
+        self._dice = tuple(term for term in self.terms if isinstance(term, DiceTerm))
+        self._flat = sum(term.sign * term.value for term in self.terms if isinstance(term, ConstantTerm))
+
+    def roll(self, rng=random):
+        """Roll the expression and return a RollResult"""
+        results = []
+        grand_total = 0
+        for term in self.terms:
+            if isinstance(term, ConstantTerm):
+                results.append(TermResult(term.label(), term.sign, None, None, term.value))
+                grand_total += term.sign * term.value
+                continue
+            rolls = term.roll_dice(rng)
+            kept = term.kept(rolls)
+            subtotal = sum(kept)
+            results.append(TermResult(term.label(), term.sign, rolls, kept, subtotal))
+            grand_total += term.sign * subtotal
+        return RollResult(self.expression, grand_total, results)
+
+    def total(self, rng=random):
+        """Roll the expression and return only the total (fast path)"""
+        grand_total = self._flat
+        for term in self._dice:
+            grand_total += term.sign * sum(term.kept(term.roll_dice(rng)))
+        return grand_total
+
+    def __repr__(self):
+        return f"CompiledRoll({self.expression!r})"
+
+
+def normalize_expression(expression):
+    """Lower-case an expression, spell out phrases and strip whitespace"""
+    text = expression.strip().lower()
+    text = _PHRASES.sub(lambda m: m.group(1)[0] + m.group(2)[0] + m.group(3), text)
+    return "".join(text.split())
+
+
+@lru_cache(maxsize=512)
+def compile_expression(expression):
+    """Compile expression text into a CompiledRoll (cached by text)"""
+    return _compile_normalized(normalize_expression(expression))
+
+
+@lru_cache(maxsize=512)
+def _compile_normalized(text):
+    """Compile an already normalized expression"""
+    return CompiledRoll(_Parser(_tokenize(text)).parse())
+
+
+@timed("dice.roll")
+def roll(expression, rng=random):
+    """Compile (or reuse) an expression and roll it once"""
+    return compile_expression(expression).roll(rng)
+
+
+@timed("dice.roll_many")
+def roll_many(expression, n, rng=None):
+    """Roll an expression n times and return only the totals
+
+    Uses NumPy when it is installed (an ndarray of int64 is returned) and
+    otherwise a stdlib array('q'). No per-roll results or strings are built.
+    rng may be a seed, a SeedStream, a NumPy Generator or a random.Random.
+    """
+    compiled = expression if isinstance(expression, CompiledRoll) else compile_expression(expression)
+    if n < 0:
+        raise ValueError("n must not be negative.")
+    if numpy_module() is not None:
+        return _roll_many_numpy(compiled, n, make_numpy_rng(rng))
+    return _roll_many_stdlib(compiled, n, make_rng(rng))
+
+
+def make_batch_rng(rng=None):
+    """Resolve rng once for repeated roll_many calls (a NumPy Generator when NumPy is installed)"""
+    if numpy_module() is not None:
+        return make_numpy_rng(rng)
+    return make_rng(rng)
+
+
+def _roll_many_numpy(compiled, n, generator):
+    """Vectorized roll_many: dice are drawn chunk by chunk into 2D arrays"""
+    np = numpy_module()
+    totals = np.full(n, compiled._flat, dtype=np.int64)
+    for term in compiled._dice:
+        rows = max(1, BATCH_CELLS // term.count)
+        for start in range(0, n, rows):
+            stop = min(n, start + rows)
+            chunk = term.batch_totals_numpy(generator, stop - start)
+            if term.sign < 0:
+                totals[start:stop] -= chunk
+            else:
+                totals[start:stop] += chunk
+    return totals
+
+
+def _roll_many_stdlib(compiled, n, rng):
+    """Pure-stdlib roll_many backed by array('q')"""
+    totals = array("q", [compiled._flat]) * n
+    for term in compiled._dice:
+        rows = max(1, BATCH_CELLS // term.count)
+        for start in range(0, n, rows):
+            stop = min(n, start + rows)
+            chunk = term.batch_totals_stdlib(rng, stop - start)
+            if term.sign < 0:
+                chunk = [-value for value in chunk]
+            totals[start:stop] = array("q", map(int.__add__, totals[start:stop], chunk))
+    return totals
+
+
+class Distribution:
+    """Exact probability distribution of a dice expression's total"""
+    __slots__ = ("offset", "probabilities", "_cdf")
+
+    def __init__(self, offset, probabilities):
+        nonzero = [index for index, p in enumerate(probabilities) if p > 0]
+        if not nonzero:
+            raise ValueError("A distribution needs at least one possible outcome.")
+        first, last = nonzero[0], nonzero[-1]
+        total = sum(probabilities)
+        self.offset = offset + first
+        self.probabilities = tuple(p / total for p in probabilities[first:last + 1])
+        self._cdf = tuple(accumulate(self.probabilities))
+
+    @property
+    def minimum(self):
+        return self.offset
+
+    @property
+    def maximum(self):
+        return self.offset + len(self.probabilities) - 1
+
+    def items(self):
+        """Yield (total, probability) pairs with non-zero probability"""
+        for index, probability in enumerate(self.probabilities):
+            if probability:
+                yield self.offset + index, probability
+
+    def pmf(self, value):
+        """Probability that the total is exactly value"""
+        index = value - self.offset
+        if 0 <= index < len(self.probabilities):
+            return self.probabilities[index]
+        return 0.0
+
+    def prob_at_most(self, value):
+        """Probability that the total is value or lower"""
+        index = value - self.offset
+        if index < 0:
+            return 0.0
+        if index >= len(self._cdf):
+            return 1.0
+        return min(1.0, self._cdf[index])
+
+    def prob_at_least(self, value):
+        """Probability that the total is value or higher (e.g. meeting a DC)"""
+        return max(0.0, 1.0 - self.prob_at_most(value - 1))
+
+    def mean(self):
+        return sum(value * probability for value, probability in self.items())
+
+    def variance(self):
+        mean = self.mean()
+        return sum((value - mean) ** 2 * probability for value, probability in self.items())
+
+    def stddev(self):
+        return sqrt(self.variance())
+
+    def percentile(self, q):
+        """Smallest total whose cumulative probability reaches q percent"""
+        if not 0 <= q <= 100:
+            raise ValueError("Percentile must be between 0 and 100.")
+        index = bisect_left(self._cdf, q / 100 - 1e-12)
+        return self.offset + min(index, len(self._cdf) - 1)
+
+    def __neg__(self):
+        return Distribution(-self.maximum, self.probabilities[::-1])
+
+    def __add__(self, other):
+        if isinstance(other, int):
+            return Distribution(self.offset + other, self.probabilities)
+        return Distribution(self.offset + other.offset, _convolve(self.probabilities, other.probabilities))
+
+    def __repr__(self):
+        return f"Distribution(min={self.minimum}, max={self.maximum}, mean={self.mean():.3f})"
+
+
+@timed("dice.distribution")
+def distribution(expression):
+    """Return the exact Distribution of an expression's total (cached when small).
+
+    Raises DiceError if distribution_cost(expression) is over MAX_DISTRIBUTION_COST.
+    """
+    compiled = expression if isinstance(expression, CompiledRoll) else compile_expression(expression)
+    if distribution_width(compiled) <= CACHED_DISTRIBUTION_WIDTH:
+        return _cached_distribution(compiled.expression)
+    return _distribution(compiled.expression)
+
+
+@lru_cache(maxsize=256)
+def _cached_distribution(text):
+    return _distribution(text)
+
+
+def _distribution(text):
+    """Distribution of a normalized expression, built term by term"""
+    compiled = _compile_normalized(text)
+    cost = distribution_cost(compiled)
+    if cost > MAX_DISTRIBUTION_COST:
+        raise DiceError(f"{text} has too many possible totals to compute exact odds. Use fewer dice or sides, or keep fewer dice.")
+    result = Distribution(compiled._flat, (1.0,))
+    for term in compiled._dice:
+        if term.keep:
+            part = _keep_distribution(_die_distribution(term.sides, term.reroll, term.explode), term.count, *term.keep)
+        else:
+            part = _sum_distribution(term.sides, term.reroll, term.explode, term.count)
+        result = result + (part if term.sign > 0 else -part)
+    return result
+
+
+@lru_cache(maxsize=32)
+def _die_distribution(sides, reroll, explode):
+    """Distribution of a single die, matching DiceTerm.roll_dice"""
+    face = 1 / sides
+    first = [face * (1 + reroll / sides) if value > reroll else face * reroll / sides for value in range(1, sides + 1)]
+    if not explode:
+        return Distribution(1, first)
+
+    # A maximum is followed by `streak` more maximums and then one lower face,
+    # unless all EXPLODE_LIMIT extra rolls came up maximum
+    probabilities = first[:-1] + [0.0]
+    chance = first[-1]
+    for streak in range(EXPLODE_LIMIT):
+        chance *= face
+        probabilities += [chance] * (sides - 1) + [0.0]
+    probabilities[-1] = chance
+    return Distribution(1, probabilities)
+
+
+def _sum_distribution(sides, reroll, explode, count):
+    """Distribution of the sum of count dice via repeated squaring"""
+    base = _die_distribution(sides, reroll, explode)
+    result = (1.0,)
+    power = base.probabilities
+    remaining = count
+    while remaining:
+        if remaining & 1:
+            result = _convolve(result, power)
+        remaining >>= 1
+        if remaining:
+            power = _convolve(power, power)
+    return Distribution(base.offset * count, result)
+
+
+def die_maximum(term):
+    """Highest value one die of a DiceTerm can show"""
+    return term.sides * (EXPLODE_LIMIT + 1) if term.explode else term.sides
+
+
+def term_width(term):
+    """Number of totals a DiceTerm's distribution spans (at most)"""
+    return (term.keep[1] if term.keep else term.count) * die_maximum(term)
+
+
+def distribution_width(expression):
+    """Number of totals an expression's distribution spans (at most)"""
+    compiled = expression if isinstance(expression, CompiledRoll) else compile_expression(expression)
+    return sum(map(term_width, compiled._dice)) + 1
+
+
+def distribution_cost(expression):
+    """Rough work for an exact distribution, in NumPy multiply-adds (about 3e8 a second).
+
+    Keep/drop terms cost their DP; sums cost their width (FFT convolutions
+    and building the result), or about its square without NumPy, where
+    convolutions are plain Python loops.
+    """
+    compiled = expression if isinstance(expression, CompiledRoll) else compile_expression(expression)
+    stdlib = numpy_module() is None
+    cost = 0
+    width = 1
+    for term in compiled._dice:
+        part = term_width(term)
+        cost += 300 * (width + part)  # building the Distributions, on either backend
+        if term.keep:
+            keep = term.keep[1]
+            cost += die_maximum(term) * keep * keep * (part + 1) // 2 * (15 if stdlib else 1)
+        elif stdlib:
+            cost += 8 * part * (part - die_maximum(term))
+        if stdlib:
+            cost += 8 * width * part  # adding the term to the running total
+        width += part
+    return cost
+
+
+def _face_weights(log_factorials, count, keep, probability, rest):
+    """Transition weights for one face of _keep_distribution.
+
+    weights[a][j] is the chance that j of the count - a unassigned dice show
+    this face (for a + j < keep). finished[a] is the chance that at least
+    keep - a of them do and all the others show a worse face (total mass rest).
+    """
+    np = numpy_module()
+    log_p, log_rest = log(probability), (log(rest) if rest else None)
+    if np is not None:
+        assigned = np.arange(keep)[:, None]
+        j = np.arange(count + 1)[None, :]
+        unassigned = count - assigned
+        others = np.maximum(unassigned - j, 0)
+        log_choose = log_factorials[unassigned] - log_factorials[j] - log_factorials[others] + j * log_p
+        weights = np.exp(np.where(assigned + j < keep, log_choose, -np.inf)[:, :keep])
+        if log_rest is None:
+            log_choose = np.where(others > 0, -np.inf, log_choose)
+        else:
+            log_choose = log_choose + others * log_rest
+        finished = np.exp(np.where((j <= unassigned) & (assigned + j >= keep), log_choose, -np.inf)).sum(axis=1)
+        return weights, finished
+
+    weights, finished = [], []
+    for assigned in range(keep):
+        unassigned = count - assigned
+
+        def log_choose(j):
+            return log_factorials[unassigned] - log_factorials[j] - log_factorials[unassigned - j] + j * log_p
+
+        weights.append([exp(log_choose(j)) for j in range(keep - assigned)])
+        if log_rest is None:
+            finished.append(exp(log_choose(unassigned)))
+        else:
+            finished.append(sum(exp(log_choose(j) + (unassigned - j) * log_rest)
+                                for j in range(keep - assigned, unassigned + 1)))
+    return weights, finished
+
+
+def _keep_distribution(die, count, mode, keep):
+    """Distribution of the sum of the best/worst `keep` of count dice
+
+    Faces are processed from best to worst. Until `keep` dice have been
+    assigned a face they are all kept, so the only state is how many dice
+    have been assigned (below keep) and the kept sum so far. The step that
+    fills the last kept slot goes straight to the result, weighted by the
+    chance that every other die shows a worse face.
+    """
+    np = numpy_module()
+    faces = [(value, probability) for value, probability in sorted(die.items(), reverse=(mode == "h")) if probability]
+    width = keep * die.maximum + 1
+    log_factorials = [lgamma(n + 1) for n in range(count + 1)]
+    if np is not None:
+        log_factorials = np.array(log_factorials)
+        states = np.zeros((keep, width))
+        states[0, 0] = 1.0
+        result = np.zeros(width)
+    else:
+        states = [[0.0] * width for _ in range(keep)]
+        states[0][0] = 1.0
+        result = [0.0] * width
+
+    rest = 1.0
+    for value, probability in faces:
+        rest = max(rest - probability, 0.0)
+        weights, finished = _face_weights(log_factorials, count, keep, probability, rest)
+        if np is not None:
+            next_states = states.copy()
+            for j in range(1, keep):
+                shift = value * j
+                span = (keep - j - 1) * die.maximum + 1  # row a only reaches a * maximum
+                next_states[j:, shift:shift + span] += weights[:keep - j, j, None] * states[:keep - j, :span]
+            for assigned in range(keep):
+                shift, span = value * (keep - assigned), assigned * die.maximum + 1
+                if finished[assigned]:
+                    result[shift:shift + span] += finished[assigned] * states[assigned, :span]
+        else:
+            next_states = [list(row) for row in states]
+            for assigned, row in enumerate(states):
+                row = row[:assigned * die.maximum + 1]  # row a only reaches a * maximum
+                if not any(row):
+                    continue
+                span = len(row)
+                for j in range(1, keep - assigned):
+                    weight, shift, target = weights[assigned][j], value * j, next_states[assigned + j]
+                    if weight:
+                        target[shift:shift + span] = [t + weight * q for t, q in zip(target[shift:shift + span], row)]
+                shift = value * (keep - assigned)
+                if finished[assigned]:
+                    result[shift:shift + span] = [t + finished[assigned] * q for t, q in zip(result[shift:shift + span], row)]
+        states = next_states
+
+    probabilities = result.tolist() if np is not None else result
+    low = next(index for index, probability in enumerate(probabilities) if probability > 0)
+    high = max(index for index, probability in enumerate(probabilities) if probability > 0)
+    return Distribution(low, probabilities[low:high + 1])
+
+
+def _convolve(a, b):
+    """Convolve two probability sequences (NumPy/FFT when available)"""
+    np = numpy_module() if len(a) * len(b) > 256 else None
+    if np is not None:
+        if min(len(a), len(b)) >= FFT_THRESHOLD:
+            size = len(a) + len(b) - 1
+            n = 1 << (size - 1).bit_length()
+            result = np.fft.irfft(np.fft.rfft(a, n) * np.fft.rfft(b, n), n)[:size]
+            return np.clip(result, 0.0, None).tolist()
+        return np.convolve(a, b).tolist()
+
+    result = [0.0] * (len(a) + len(b) - 1)
+    width = len(b)
+    for index, x in enumerate(a):
+        if x:
+            result[index:index + width] = [r + x * y for r, y in zip(result[index:index + width], b)]
+    return result
+
+
+def _tokenize(text):
+    """Split normalized expression text into tokens"""
+    if not text:
+        raise DiceError("Empty dice expression.")
+    tokens = []
+    position = 0
+    for match in _TOKENS.finditer(text):
+        if match.start() != position:
+            raise DiceError(f"Unexpected '{text[position:match.start()]}' in dice expression.")
+        tokens.append(match.group())
+        position = match.end()
+    if position != len(text):
+        raise DiceError(f"Unexpected '{text[position:]}' in dice expression.")
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser: expr := ['+'|'-'] term (('+'|'-') term)*"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def number(self, default=None):
+        token = self.peek()
+        if token is not None and token.isdigit():
+            self.position += 1
+            return int(token)
+        if default is None:
+            raise DiceError("Expected a number in dice expression.")
+        return default
+
+    def parse(self):
+        terms = []
+        sign = 1
+        if self.peek() in ("+", "-"):
+            sign = -1 if self.take() == "-" else 1
+        terms.append(self.term(sign))
+        while self.peek() is not None:
+            operator = self.take()
+            if operator not in ("+", "-"):
+                raise DiceError(f"Expected '+' or '-' but found '{operator}'.")
+            terms.append(self.term(-1 if operator == "-" else 1))
+        return terms
+
+    def term(self, sign):
+        token = self.peek()
+        if token is not None and token.isdigit():
+            count = self.number()
+            if self.peek() != "d":
+                return ConstantTerm(sign, count)
+        elif token == "d":
+            count = 1
+        else:
+            raise DiceError("Expected dice (XdY) or a number.")
+        self.take()
+        if self.peek() == "%":
+            self.take()
+            sides = 100
+        else:
+            sides = self.number()
+
+        if not 1 <= count <= MAX_DICE:
+            raise DiceError(f"Number of dice must be between 1 and {MAX_DICE}.")
+        if not 1 <= sides <= MAX_SIDES:
+            raise DiceError(f"Number of sides must be between 1 and {MAX_SIDES}.")
+
+        keep = None
+        explode = False
+        reroll = 0
+        while self.peek() in ("kh", "kl", "k", "dh", "dl", "!", "r"):
+            token = self.take()
+            if token == "!":
+                explode = True
+            elif token == "r":
+                reroll = self.number(default=1)
+                if reroll >= sides:
+                    raise DiceError("Reroll threshold must be lower than the number of sides.")
+            else:
+                if keep is not None:
+                    raise DiceError("Only one keep/drop modifier is allowed per dice term.")
+                number = self.number(default=1)
+                if token in ("dh", "dl"):
+                    number = count - number
+                    token = "kl" if token == "dh" else "kh"
+                if not 1 <= number <= count:
+                    raise DiceError("Keep/drop must leave between 1 and all of the dice.")
+                keep = ("l" if token == "kl" else "h", number) if number < count else None
+        return DiceTerm(sign, count, sides, keep, explode, reroll)
+
+
+def _render(terms):
+    """Render terms back into canonical expression text"""
+    text = ""
+    for term in terms:
+        sign = "-" if term.sign < 0 else "+"
+        text += sign + term.label()
+    return text.lstrip("+")
 
 
 class Dice:
     """ Class to handle rolling dice based on user input."""
-    def __init__(self, dice_input):
+    def __init__(self, dice_input, rng=None):
         self.dice_input = dice_input.strip()
+        self.compiled = compile_expression(self.dice_input)
+        self.rng = make_rng(rng)
 
 
+    @timed("dice.Dice.roll")
     def roll(self):
-        """ Roll the dice based on the user input."""
-        dice_patterns = re.findall(r"(\d*)d(\d+)", self.dice_input, re.IGNORECASE)
-        if not dice_patterns:
-            print("Invalid input. Please use the format XdY (e.g., 1d6, 2d20, 1d20 + 2d8 + 1d4).")
-            return
-        
-        modifier_choice = input("Would you like to add a modifier to each roll or to the total? (each/total/none): ").strip().lower()
-        modifier = 0
-        if modifier_choice in ("each", "total"):
-            modifier = int(input("Enter the modifier value: "))
-            
-        total_rolls = []
-        grand_total = 0
-        
-        for num, sides in dice_patterns:
-            num_dice = int(num) if num else 1  # Default to 1 if omitted
-            dice_sides = int(sides)
-            
-            rolls = [random.randint(1, dice_sides) for _ in range(num_dice)]
-            if modifier_choice == "each":
-                modified_rolls = [r + modifier for r in rolls]
-                roll_str = f"{num_dice}d{dice_sides}: {', '.join(f'{r} (+{modifier})' for r in modified_rolls)}"
-            else:
-                roll_str = f"{num_dice}d{dice_sides}: {', '.join(map(str, rolls))}"
-            
-            total_rolls.append(roll_str)
-            grand_total += sum(modified_rolls) if modifier_choice == "each" else sum(rolls)
-        
-        if modifier_choice == "total":
-            grand_total += modifier
-            total_rolls.append(f"(+{modifier})")
-        
-        print("Rolling:")
-        print(" | ".join(total_rolls))
-        print(f"Total: {grand_total}")
+        """ Roll the dice and return a RollResult."""
+        return self.compiled.roll(self.rng)
+
+
+    def total(self):
+        """ Roll the dice and return only the total."""
+        return self.compiled.total(self.rng)
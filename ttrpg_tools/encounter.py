@@ -0,0 +1,381 @@
+"""Encounter builder: random monster groups that fit a party's XP budget.
+
+Monsters are loaded from a JSON (or CSV) file into a MonsterIndex of flat
+columns with lookups by CR, XP, environment and type. Difficulty follows
+the 5th edition Dungeon Master's Guide: the party's XP thresholds bound the
+adjusted XP of the encounter, which is the monsters' total XP times a
+multiplier for the number of monsters.
+
+Budgets are solved with a bitset DP over the distinct XP values of the
+allowed monsters: bit s of reach[k] is set when k monsters can total s XP.
+Each encounter is then drawn by walking back through reach from a random
+reachable total, so every encounter fits and nothing is retried.
+"""
+import csv
+from functools import reduce
+from math import ceil, gcd
+
+from ttrpg_tools.instrument import timed
+from ttrpg_tools.registry import DataRegistry, registry
+from ttrpg_tools.rng import make_rng
+from ttrpg_tools.storage import load_data
+
+
+CR_XP = {
+    "0": 10, "1/8": 25, "1/4": 50, "1/2": 100, "1": 200, "2": 450, "3": 700, "4": 1100, "5": 1800,
+    "6": 2300, "7": 2900, "8": 3900, "9": 5000, "10": 5900, "11": 7200, "12": 8400, "13": 10000,
+    "14": 11500, "15": 13000, "16": 15000, "17": 18000, "18": 20000, "19": 22000, "20": 25000,
+    "21": 33000, "22": 41000, "23": 50000, "24": 62000, "25": 75000, "26": 90000, "27": 105000,
+    "28": 120000, "29": 135000, "30": 155000,
+}
+
+DIFFICULTIES = ("easy", "medium", "hard", "deadly")
+
+# XP thresholds per character level: easy, medium, hard, deadly
+XP_THRESHOLDS = {
+    1: (25, 50, 75, 100), 2: (50, 100, 150, 200), 3: (75, 150, 225, 400), 4: (125, 250, 375, 500),
+    5: (250, 500, 750, 1100), 6: (300, 600, 900, 1400), 7: (350, 750, 1100, 1700), 8: (450, 900, 1400, 2100),
+    9: (550, 1100, 1600, 2400), 10: (600, 1200, 1900, 2800), 11: (800, 1600, 2400, 3600), 12: (1000, 2000, 3000, 4500),
+    13: (1100, 2200, 3400, 5100), 14: (1250, 2500, 3800, 5700), 15: (1400, 2800, 4300, 6400), 16: (1600, 3200, 4800, 7200),
+    17: (2000, 3900, 5900, 8800), 18: (2100, 4200, 6300, 9500), 19: (2400, 4900, 7300, 10900), 20: (2800, 5700, 8500, 12700),
+}
+
+# Encounter multipliers; small parties use the next one up, large parties the next one down
+MULTIPLIERS = (0.5, 1, 1.5, 2, 2.5, 3, 4, 5)
+
+# How far past the deadly threshold a deadly encounter may go
+DEADLY_CEILING = 1.5
+
+
+def cr_value(cr):
+    """Numeric challenge rating of '1/4', '2', 0.5, ..."""
+    try:
+        if isinstance(cr, str) and "/" in cr:
+            numerator, denominator = cr.split("/")
+            return int(numerator) / int(denominator)
+        return float(cr)
+    except (ValueError, ZeroDivisionError):
+        raise ValueError(f"Invalid challenge rating '{cr}'.") from None
+
+
+def cr_label(value):
+    """Challenge rating as written in stat blocks (0.25 -> '1/4')"""
+    for label in ("1/8", "1/4", "1/2"):
+        if value == cr_value(label):
+            return label
+    return f"{value:g}"
+
+
+def encounter_multiplier(monsters, party_size=4):
+    """Multiplier applied to the XP of a group of monsters"""
+    if monsters <= 0:
+        return 0
+    band = 1 if monsters == 1 else 2 if monsters == 2 else 3 if monsters <= 6 else 4 if monsters <= 10 else 5 if monsters <= 14 else 6
+    if party_size < 3:
+        band += 1
+    elif party_size >= 6:
+        band -= 1
+    return MULTIPLIERS[band]
+
+
+def party_thresholds(levels):
+    """{difficulty: XP threshold} for a party with these character levels"""
+    thresholds = [0, 0, 0, 0]
+    for level in levels:
+        if level not in XP_THRESHOLDS:
+            raise ValueError(f"Character levels must be between 1 and 20, not {level}.")
+        thresholds = [total + xp for total, xp in zip(thresholds, XP_THRESHOLDS[level])]
+    return dict(zip(DIFFICULTIES, thresholds))
+
+
+def parse_party(text):
+    """Parse a party such as '3, 3, 4, 5' or '4x5' (four level 5 characters) into levels"""
+    levels = []
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        count, separator, level = part.lower().partition("x")
+        levels.extend([int(level)] * int(count) if separator else [int(count)])
+    if not levels:
+        raise ValueError("Enter at least one character level.")
+    return levels
+
+
+def read_monster_file(path):
+    """Read monster data from JSON (like data/monsters.json) or CSV.
+
+    CSV files need name and cr columns, and may have type, xp and
+    environments (separated by ';') columns.
+    """
+    if not str(path).lower().endswith(".csv"):
+        return load_data(path)
+    with open(path, 'r', newline="", encoding="utf-8") as file:
+        monsters = []
+        for row in csv.DictReader(file):
+            monster = {"name": row["name"].strip(), "cr": row["cr"].strip(), "type": (row.get("type") or "").strip()}
+            monster["environments"] = [env.strip() for env in (row.get("environments") or "").split(";") if env.strip()]
+            if row.get("xp"):
+                monster["xp"] = int(row["xp"])
+            monsters.append(monster)
+    return {"monsters": monsters}
+
+
+# CSV monster files are parsed with their own loader but cached the same way as every other data file
+csv_registry = DataRegistry(read_monster_file)
+
+
+class MonsterIndex:
+    """Monster columns plus lookups from CR, XP, environment and type to monster numbers"""
+    __slots__ = ("names", "crs", "xps", "types", "environments", "by_cr", "by_xp", "by_environment", "by_type")
+
+    def __init__(self, data):
+        monsters = data.get("monsters", ())
+        self.names = tuple(monster["name"] for monster in monsters)
+        self.crs = tuple(cr_value(monster["cr"]) for monster in monsters)
+        self.xps = tuple(int(monster.get("xp") or CR_XP[cr_label(cr)]) for monster, cr in zip(monsters, self.crs))
+        self.types = tuple(monster.get("type", "").lower() for monster in monsters)
+        self.environments = tuple(frozenset(env.lower() for env in monster.get("environments", ())) for monster in monsters)
+        self.by_cr = self._group(self.crs)
+        self.by_xp = self._group(self.xps)
+        self.by_type = self._group(self.types)
+        self.by_environment = self._group_pairs((env, number) for number, envs in enumerate(self.environments) for env in envs)
+
+    def _group(self, keys):
+        return self._group_pairs((key, number) for number, key in enumerate(keys))
+
+    @staticmethod
+    def _group_pairs(pairs):
+        groups = {}
+        for key, number in pairs:
+            groups.setdefault(key, []).append(number)
+        return {key: tuple(numbers) for key, numbers in groups.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def select(self, environments=None, types=None, min_cr=None, max_cr=None):
+        """Sorted numbers of the monsters matching every given filter"""
+        selected = set(range(len(self.names)))
+        if environments is not None:
+            selected &= {number for env in environments for number in self.by_environment.get(env, ())}
+        if types is not None:
+            selected &= {number for kind in types for number in self.by_type.get(kind.lower(), ())}
+        if min_cr is not None or max_cr is not None:
+            low = -1 if min_cr is None else cr_value(min_cr)
+            high = float("inf") if max_cr is None else cr_value(max_cr)
+            selected &= {number for cr, numbers in self.by_cr.items() if low <= cr <= high for number in numbers}
+        return sorted(selected)
+
+
+class Encounter:
+    """A group of monsters with its XP totals"""
+    __slots__ = ("monsters", "xp", "adjusted_xp", "difficulty")
+
+    def __init__(self, monsters, xp, adjusted_xp, difficulty):
+        self.monsters = monsters  # ((name, cr, xp, count), ...), most dangerous first
+        self.xp = xp
+        self.adjusted_xp = adjusted_xp
+        self.difficulty = difficulty
+
+    def __str__(self):
+        group = ", ".join(f"{count} x {name}" if count > 1 else name for name, _, _, count in self.monsters)
+        return f"{group} ({self.difficulty}, {self.xp:,} XP, adjusted {self.adjusted_xp:,g} XP)"
+
+    def to_dict(self):
+        return {
+            "monsters": [{"name": name, "cr": cr_label(cr), "xp": xp, "count": count} for name, cr, xp, count in self.monsters],
+            "xp": self.xp,
+            "adjusted_xp": self.adjusted_xp,
+            "difficulty": self.difficulty,
+        }
+
+
+class EncounterSolver:
+    """Draws random encounters whose adjusted XP lies in [low, high).
+
+    An encounter is up to max_kinds groups of identical monsters. reach[j][k]
+    is a bitset of the totals that j monsters in at most k groups can reach;
+    XP values are divided by their greatest common divisor so the bitsets
+    stay small (the 5th edition values are all multiples of 5).
+    """
+
+    def __init__(self, index, numbers, low, high, max_monsters=8, party_size=4, max_kinds=3, difficulty=None):
+        self.index = index
+        self.party_size = party_size
+        self.difficulty = difficulty
+        groups = {}
+        for number in numbers:
+            groups.setdefault(index.xps[number], []).append(number)
+        self.groups = {xp: tuple(group) for xp, group in groups.items()}
+        self.unit = reduce(gcd, self.groups, 0) or 1
+        self.values = sorted(xp // self.unit for xp in self.groups)
+
+        # Raw XP window for each number of monsters
+        windows = {}
+        for count in range(1, max_monsters + 1):
+            multiplier = encounter_multiplier(count, party_size)
+            first = ceil(low / multiplier / self.unit)
+            last = ceil(high / multiplier / self.unit) - 1
+            if self.values and first <= last and count * self.values[0] <= last:
+                windows[count] = (first, last)
+
+        most = max(windows, default=0)
+        mask = (1 << (max((last for _, last in windows.values()), default=-1) + 1)) - 1
+        reach = [[1] * (max_kinds + 1)] + [[0] * (max_kinds + 1) for _ in range(most)]
+        for kinds in range(1, max_kinds + 1):
+            for count in range(1, most + 1):
+                fits = reach[count][kinds - 1]
+                for size in range(1, count + 1):
+                    fewer = reach[count - size][kinds - 1]
+                    if fewer:
+                        for value in self.values:
+                            fits |= fewer << (value * size)
+                reach[count][kinds] = fits & mask
+        self.reach = reach
+        self.max_kinds = max_kinds
+
+        # Totals that fit for each number of monsters
+        self.targets = {}
+        for count, (first, last) in windows.items():
+            bits = reach[count][max_kinds] >> first
+            totals = [first + offset for offset in range(last - first + 1) if bits >> offset & 1]
+            if totals:
+                self.targets[count] = totals
+        self.counts = tuple(self.targets)
+
+    def __bool__(self):
+        return bool(self.targets)
+
+    def draw(self, rng):
+        """One random Encounter, or None if nothing fits the budget.
+
+        The number of monsters is picked uniformly from those that can fit,
+        so lone monsters and hordes are as likely as mid-sized groups.
+        """
+        if not self.targets:
+            return None
+        count = rng.choice(self.counts)
+        total = rng.choice(self.targets[count])
+        reach, values = self.reach, self.values
+        chosen = []
+        kinds = self.max_kinds
+        while count:
+            kinds -= 1
+            options = [
+                (value, size)
+                for size in range(1, count + 1)
+                for value in values
+                if value * size <= total and reach[count - size][kinds] >> (total - value * size) & 1
+            ]
+            value, size = rng.choice(options)
+            chosen.append((value, size))
+            count -= size
+            total -= value * size
+        return self._encounter(chosen, rng)
+
+    def _encounter(self, chosen, rng):
+        index = self.index
+        counts = {}
+        for value, size in chosen:
+            number = rng.choice(self.groups[value * self.unit])
+            counts[number] = counts.get(number, 0) + size
+        numbers = sorted(counts, key=lambda number: (-index.xps[number], index.names[number]))
+        monsters = tuple((index.names[number], index.crs[number], index.xps[number], counts[number]) for number in numbers)
+        xp = sum(index.xps[number] * size for number, size in counts.items())
+        return Encounter(monsters, xp, xp * encounter_multiplier(sum(counts.values()), self.party_size), self.difficulty)
+
+
+class EncounterBuilder:
+    """Builds random encounters for a party from a monster dataset"""
+    def __init__(self, data_file="data/monsters.json", location_file=None, rng=None):
+        self.data_file = data_file
+        self.location_file = location_file
+        self.rng = make_rng(rng)
+        self.monster_data = {}
+        self.index = MonsterIndex({})
+        self.solvers = {}
+        self.load_monsters()
+
+
+    @timed("encounters.load_monsters")
+    def load_monsters(self):
+        """Load the monster data and build the index"""
+        source = csv_registry if self.data_file.lower().endswith(".csv") else registry
+        try:
+            monster_data, loaded = source.load(self.data_file)
+            if monster_data is None:
+                print(f"Monster file {self.data_file} not found. No monsters are available.")
+                return
+            self.monster_data = monster_data
+            self.index = source.derived(self.data_file, "monster_index", MonsterIndex)
+            self.solvers = {}
+            if loaded:
+                print(f"Successfully loaded {len(self.index)} monsters from {self.data_file}")
+
+        except Exception as e:
+            print(f"Error loading monsters: {e}")
+
+
+    def terrain_categories(self):
+        """The location generator's terrain categories (or the monster file's, if it has no data file)"""
+        from ttrpg_tools.location_generator import LOCATION_DATA_FILE, terrain_categories
+        try:
+            categories = terrain_categories(self.location_file or LOCATION_DATA_FILE)
+        except Exception as e:
+            print(f"Error loading location data: {e}")
+            categories = ()
+        return categories or tuple(self.monster_data.get("terrains", ()))
+
+
+    def environments_for(self, terrain):
+        """Monster environments found in a terrain category (a category is also an environment of its own)"""
+        terrain = terrain.lower()
+        return (terrain, *self.monster_data.get("terrains", {}).get(terrain, ()))
+
+
+    def solver(self, levels, difficulty="medium", terrain=None, types=None, min_cr=None, max_cr=None, max_monsters=8, max_kinds=3):
+        """Solver for a party and filters, built once and reused.
+
+        terrain is a terrain category of the location generator (or a monster
+        environment), types limits the monster types and min_cr/max_cr their
+        challenge ratings; max_kinds caps the number of different monsters.
+        """
+        difficulty = difficulty.lower()
+        if difficulty not in DIFFICULTIES:
+            raise ValueError(f"Invalid difficulty '{difficulty}'. Choose from: {', '.join(DIFFICULTIES)}.")
+        if terrain and terrain.lower() not in self.terrain_categories() and terrain.lower() not in self.index.by_environment:
+            choices = dict.fromkeys((*self.terrain_categories(), *sorted(self.index.by_environment)))
+            raise ValueError(f"Unknown terrain '{terrain}'. Choose from: {', '.join(choices)}.")
+        key = (tuple(sorted(levels)), difficulty, terrain and terrain.lower(), types and tuple(sorted(types)), min_cr, max_cr, max_monsters, max_kinds)
+        solver = self.solvers.get(key)
+        if solver is None:
+            thresholds = party_thresholds(levels)
+            position = DIFFICULTIES.index(difficulty)
+            low = thresholds[difficulty]
+            high = thresholds[DIFFICULTIES[position + 1]] if position + 1 < len(DIFFICULTIES) else low * DEADLY_CEILING
+            environments = self.environments_for(terrain) if terrain else None
+            numbers = self.index.select(environments, types, min_cr, max_cr)
+            solver = self.solvers[key] = EncounterSolver(self.index, numbers, low, high, max_monsters, len(levels), max_kinds, difficulty)
+        return solver
+
+
+    @timed("encounters.generate_encounters")
+    def generate_encounters(self, levels, difficulty="medium", terrain=None, count=1, **filters):
+        """Generate count encounters (an empty list when no monsters fit the budget); filters are those of solver()"""
+        solver = self.solver(levels, difficulty, terrain, **filters)
+        if not solver:
+            return []
+        return [solver.draw(self.rng) for _ in range(count)]
+
+
+    def generate_encounter(self, levels, difficulty="medium", terrain=None, **filters):
+        """Generate one encounter, or a message if none fits"""
+        encounters = self.generate_encounters(levels, difficulty, terrain, 1, **filters)
+        if not encounters:
+            return f"No {difficulty} encounter fits that party{f' in {terrain} terrain' if terrain else ''}."
+        return encounters[0]
+
+
+    def get_monster_types(self):
+        """Return a sorted list of monster types"""
+        return sorted(kind for kind in self.index.by_type if kind)
@@ -0,0 +1,132 @@
+"""Stream generated content to text, CSV, JSON Lines or Markdown roll tables.
+
+Every writer takes an iterable of chunks (lists of values, as produced by
+iter_name_chunks, the CLI and the parallel shards) and writes each chunk
+with a single write call, so a million-row export never holds more than
+one chunk in memory. Values may be strings, numbers or dicts.
+"""
+import csv
+import io
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+
+FORMATS = ("text", "csv", "jsonl", "markdown")
+EXTENSIONS = {".txt": "text", ".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".md": "markdown", ".markdown": "markdown"}
+BUFFER_SIZE = 1 << 20
+
+
+def detect_export_format(path, default="text"):
+    """Export format implied by a file name"""
+    return EXTENSIONS.get(os.path.splitext(str(path))[1].lower(), default)
+
+
+def write_text(chunks, out, field="value", die=None):
+    """One value per line"""
+    written = 0
+    for chunk in chunks:
+        out.write("".join(f"{value}\n" for value in chunk))
+        written += len(chunk)
+    return written
+
+
+def write_csv(chunks, out, field="value", die=None):
+    """A CSV file with a header row; dict values become one column per key"""
+    written = 0
+    buffer = io.StringIO()
+    writer = None
+    for chunk in chunks:
+        if writer is None and chunk:
+            if isinstance(chunk[0], dict):
+                writer = csv.DictWriter(buffer, fieldnames=list(chunk[0]), lineterminator="\n", extrasaction="ignore")
+                writer.writeheader()
+            else:
+                writer = csv.writer(buffer, lineterminator="\n")
+                writer.writerow([field])
+        if isinstance(writer, csv.DictWriter):
+            writer.writerows({key: json.dumps(value) if isinstance(value, (list, dict)) else value for key, value in row.items()} for row in chunk)
+        elif writer is not None:
+            writer.writerows([value] for value in chunk)
+        out.write(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+        written += len(chunk)
+    return written
+
+
+def write_jsonl(chunks, out, field="value", die=None):
+    """One JSON object per line; plain values are wrapped as {field: value}"""
+    written = 0
+    dumps = json.dumps
+    for chunk in chunks:
+        out.write("".join(dumps(value if isinstance(value, dict) else {field: value}) + "\n" for value in chunk))
+        written += len(chunk)
+    return written
+
+
+def roll_labels(die):
+    """Row labels of a roll table for a die with that many sides.
+
+    Powers of ten follow the usual table convention (d100: 01..99, 00);
+    other dice are numbered 1..N, zero-padded.
+    """
+    digits = len(str(die))
+    if die >= 10 and die == 10 ** (digits - 1):
+        width = digits - 1
+        return (f"{number % die:0{width}d}" for number in range(1, die + 1))
+    return (f"{number:0{digits}d}" for number in range(1, die + 1))
+
+
+def write_markdown(chunks, out, field="value", die=None):
+    """A Markdown roll table: | dN | field | with one numbered row per value.
+
+    die is the number of rows (the size of the die to roll on the table);
+    without it rows are simply numbered.
+    """
+    labels = roll_labels(die) if die else map(str, range(1, sys.maxsize))
+    out.write(f"| {f'd{die}' if die else '#'} | {field.capitalize()} |\n|---:|---|\n")
+    written = 0
+    for chunk in chunks:
+        rows = []
+        for value in chunk:
+            text = json.dumps(value) if isinstance(value, dict) else str(value)
+            text = text.replace("|", "\\|")
+            rows.append(f"| {next(labels)} | {text} |\n")
+        out.write("".join(rows))
+        written += len(chunk)
+    return written
+
+
+WRITERS = {
+    "text": write_text,
+    "csv": write_csv,
+    "jsonl": write_jsonl,
+    "markdown": write_markdown,
+}
+
+
+def export(chunks, out, fmt="text", field="value", die=None):
+    """Write chunks to an open text stream in fmt, returning the number of rows"""
+    writer = WRITERS.get(fmt)
+    if writer is None:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose from: {', '.join(FORMATS)}.")
+    return writer(chunks, out, field, die)
+
+
+@contextmanager
+def open_output(path=None):
+    """A buffered text stream for path, or stdout when path is None"""
+    if path is None:
+        yield sys.stdout
+        return
+    with open(path, 'w', newline="", encoding="utf-8", buffering=BUFFER_SIZE) as out:
+        yield out
+
+
+def export_to_file(chunks, path, fmt=None, field="value", die=None):
+    """Write chunks to path (format from the file name unless given), returning the number of rows"""
+    fmt = fmt or detect_export_format(path)
+    with open_output(path) as out:
+        return export(chunks, out, fmt, field, die)
@@ -0,0 +1,347 @@
+import glob
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from itertools import islice
+
+from ttrpg_tools.instrument import timed
+from ttrpg_tools.registry import registry
+from ttrpg_tools.storage import DeferredSaves, save_data
+
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+SORT_ORDERS = ("saved", "timestamp", "name")
+
+
+def check_sort(sort):
+    """Raise ValueError for an unknown sort order"""
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"Invalid sort '{sort}'. Choose from: {', '.join(SORT_ORDERS)}.")
+
+
+def make_entry(name, tags=None, timestamp=None):
+    """Build a saved-name entry"""
+    return {
+        "name": name,
+        "timestamp": timestamp or datetime.now().isoformat(),
+        "tags": list(tags or []),
+    }
+
+
+class JSONHistory(DeferredSaves):
+    """Saved names kept as a JSON snapshot plus an append-only JSON Lines journal.
+
+    Saving a name appends one line to the journal, so it costs the same no
+    matter how long the history is; fsyncs are batched. Once the journal
+    grows past compact_every entries it is folded into the snapshot
+    ({"saved_names": [...], "journal": generation}) on a background thread.
+    Loading replays the snapshot and then every journal of the snapshot's
+    generation or later. The journal file is only created by the first add,
+    so reading the history leaves no files behind.
+    """
+    sync_every = 64
+    sync_interval = 1.0
+    compact_every = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_prefix = os.path.splitext(path)[0] + ".journal."
+        self.data = {"saved_names": []}
+        self.generation = 0
+        self.journal = None
+        self.journal_entries = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.RLock()
+        self._compactor = None
+        self.load()
+
+    def journal_path(self, generation):
+        """Path of the journal file for a generation"""
+        return f"{self.journal_prefix}{generation}.jsonl"
+
+    def journal_files(self):
+        """(generation, path) of every journal file on disk, oldest first"""
+        files = []
+        for path in glob.glob(glob.escape(self.journal_prefix) + "*.jsonl"):
+            generation = path[len(self.journal_prefix):-len(".jsonl")]
+            if generation.isdigit():
+                files.append((int(generation), path))
+        return sorted(files)
+
+    @timed("history.json.load")
+    def load(self):
+        """Load the snapshot and replay the journal written since it"""
+        try:
+            snapshot, loaded = registry.load(self.path)
+            if snapshot is not None:
+                if loaded:
+                    print(f"Successfully loaded name history from {self.path}")
+            else:
+                snapshot = {"saved_names": [], "journal": 0}
+                save_data(snapshot, self.path)
+                registry.store(self.path, snapshot)
+
+        except Exception as e:
+            print(f"Error loading name history: {e}")
+            snapshot = {"saved_names": []}
+
+        self.generation = snapshot.get("journal", 0)
+        entries = list(snapshot.get("saved_names", []))
+        self.journal_entries = 0
+        for generation, path in self.journal_files():
+            if generation < self.generation:
+                continue  # already folded into the snapshot
+            with open(path, 'r', encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # a write torn by a crash
+                    self.journal_entries += 1
+            self.generation = generation
+        self.data = {"saved_names": entries}
+
+    def _open_journal(self):
+        path = self.journal_path(self.generation)
+        self.journal = open(path, 'a+', encoding="utf-8")
+        if self.journal.tell():
+            self.journal.seek(self.journal.tell() - 1)
+            if self.journal.read(1) != "\n":
+                self.journal.write("\n")
+
+    def add(self, name, tags=None, timestamp=None):
+        """Save a name by appending it to the journal and return its entry"""
+        entry = make_entry(name, tags, timestamp)
+        with self._lock:
+            if self.journal is None:
+                self._open_journal()
+            self.data["saved_names"].append(entry)
+            self.journal.write(json.dumps(entry) + "\n")
+            self.journal_entries += 1
+            self._unsynced += 1
+        self.save()
+        if self.journal_entries >= self.compact_every:
+            self.compact(wait=False)
+        return entry
+
+    @timed("history.json.save")
+    def save(self):
+        """Flush the journal, fsyncing every sync_every entries or sync_interval seconds"""
+        if self.defer_save(self.save) or self.journal is None:
+            return
+        with self._lock:
+            self.journal.flush()
+            if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                self.sync()
+
+    @timed("history.json.sync")
+    def sync(self):
+        """Flush and fsync the journal now"""
+        with self._lock:
+            if self.journal is None:
+                return
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def compact(self, wait=True):
+        """Fold the journal into a new snapshot (in the background unless wait)"""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                if not wait:
+                    return
+                self._compactor.join()  # then fold in what was journaled since it started
+            if self.journal is not None:
+                self.sync()
+                self.journal.close()
+                self.journal = None  # the next add opens the new generation's journal
+            self.generation += 1
+            self.journal_entries = 0
+            snapshot = {"saved_names": list(self.data["saved_names"]), "journal": self.generation}
+            self._compactor = threading.Thread(target=self._write_snapshot, args=(snapshot,), daemon=True)
+            self._compactor.start()
+        if wait:
+            self._compactor.join()
+
+    @timed("history.json.compact")
+    def _write_snapshot(self, snapshot):
+        try:
+            save_data(snapshot, self.path)
+            registry.store(self.path, snapshot)
+            for generation, path in self.journal_files():
+                if generation < snapshot["journal"]:
+                    os.remove(path)
+
+        except Exception as e:
+            print(f"Error compacting name history: {e}")
+
+    def entries(self, filter_tag=None):
+        """Iterate over saved entries in the order they were saved"""
+        for entry in self.data["saved_names"]:
+            if filter_tag is None or filter_tag in entry.get("tags", []):
+                yield entry
+
+    def iter_entries(self, filter_tag=None, sort="saved", descending=False, offset=0, limit=None):
+        """Lazily yield one page (offset/limit) of entries in the requested order"""
+        check_sort(sort)
+        entries = self.entries(filter_tag)
+        if sort == "saved":
+            if descending:
+                entries = (entry for entry in reversed(self.data["saved_names"])
+                           if filter_tag is None or filter_tag in entry.get("tags", []))
+        else:
+            key = (lambda entry: entry[sort])
+            if limit is not None:
+                pick = heapq.nlargest if descending else heapq.nsmallest
+                entries = pick(offset + limit, entries, key=key)
+            else:
+                entries = sorted(entries, key=key, reverse=descending)
+        stop = None if limit is None else offset + limit
+        return islice(entries, offset, stop)
+
+    def count(self, filter_tag=None):
+        """Number of saved entries (with the tag, if given)"""
+        if filter_tag is None:
+            return len(self.data["saved_names"])
+        return sum(1 for _ in self.entries(filter_tag))
+
+    def close(self):
+        """Finish any compaction, then fsync and close the journal"""
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            if self.journal is not None:
+                self.sync()
+                self.journal.close()
+                self.journal = None
+
+
+class SQLiteHistory(DeferredSaves):
+    """Saved names kept in an SQLite database with indexed names, timestamps and tags.
+
+    Inserts cost the same no matter how many names are stored, and tag
+    filters use an index instead of scanning every entry.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS saved_names (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            tags TEXT NOT NULL DEFAULT '[]'
+        );
+        CREATE TABLE IF NOT EXISTS saved_name_tags (
+            tag TEXT NOT NULL,
+            entry_id INTEGER NOT NULL REFERENCES saved_names(id) ON DELETE CASCADE,
+            PRIMARY KEY (tag, entry_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS saved_names_name ON saved_names(name);
+        CREATE INDEX IF NOT EXISTS saved_names_timestamp ON saved_names(timestamp);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        import sqlite3  # only needed when a database history is used
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(self.SCHEMA)
+        self.connection.commit()
+
+    @timed("history.sqlite.save")
+    def save(self):
+        """Commit pending inserts"""
+        if self.defer_save(self.save):
+            return
+        self.connection.commit()
+
+    def add(self, name, tags=None, timestamp=None):
+        """Save a name and return its entry"""
+        entry = make_entry(name, tags, timestamp)
+        self._insert(entry)
+        self.save()
+        return entry
+
+    def add_many(self, entries):
+        """Insert many existing entries in one transaction, returning how many"""
+        count = 0
+        with self.batch():
+            for entry in entries:
+                self._insert(make_entry(entry["name"], entry.get("tags"), entry.get("timestamp")))
+                count += 1
+        return count
+
+    def _insert(self, entry):
+        cursor = self.connection.execute(
+            "INSERT INTO saved_names (name, timestamp, tags) VALUES (?, ?, ?)",
+            (entry["name"], entry["timestamp"], json.dumps(entry["tags"])),
+        )
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO saved_name_tags (tag, entry_id) VALUES (?, ?)",
+            [(tag, cursor.lastrowid) for tag in entry["tags"]],
+        )
+
+    def entries(self, filter_tag=None):
+        """Iterate over saved entries in the order they were saved"""
+        return self.iter_entries(filter_tag)
+
+    def iter_entries(self, filter_tag=None, sort="saved", descending=False, offset=0, limit=None):
+        """Lazily yield one page (offset/limit) of entries, streamed from a database cursor"""
+        check_sort(sort)
+        direction = "DESC" if descending else "ASC"
+        order = f"n.id {direction}" if sort == "saved" else f"n.{sort} {direction}, n.id {direction}"
+        if filter_tag is None:
+            query = f"SELECT n.name, n.timestamp, n.tags FROM saved_names n ORDER BY {order} LIMIT ? OFFSET ?"
+            parameters = ()
+        else:
+            query = (
+                "SELECT n.name, n.timestamp, n.tags FROM saved_name_tags t "
+                f"JOIN saved_names n ON n.id = t.entry_id WHERE t.tag = ? ORDER BY {order} LIMIT ? OFFSET ?"
+            )
+            parameters = (filter_tag,)
+        rows = self.connection.execute(query, parameters + (-1 if limit is None else limit, offset))
+        return ({"name": name, "timestamp": timestamp, "tags": json.loads(tags)} for name, timestamp, tags in rows)
+
+    def count(self, filter_tag=None):
+        """Number of saved entries (with the tag, if given)"""
+        if filter_tag is None:
+            return self.connection.execute("SELECT COUNT(*) FROM saved_names").fetchone()[0]
+        return self.connection.execute("SELECT COUNT(*) FROM saved_name_tags WHERE tag = ?", (filter_tag,)).fetchone()[0]
+
+    def close(self):
+        """Commit and close the database"""
+        self.connection.commit()
+        self.connection.close()
+
+
+def open_history(path):
+    """Open the history backend that matches the file name"""
+    if str(path).lower().endswith(SQLITE_EXTENSIONS):
+        return SQLiteHistory(path)
+    return JSONHistory(path)
+
+
+def migrate_json_history(json_path, db_path):
+    """Copy every entry of a JSON history (snapshot and journal) into an SQLite history database"""
+    if not os.path.exists(json_path):
+        raise ValueError(f"No name history at {json_path}.")
+    source = JSONHistory(json_path)
+    history = SQLiteHistory(db_path)
+    try:
+        before = history.count()
+        count = history.add_many(source.entries())
+        # Every entry, including ones still only in journal segments, must arrive
+        if count != source.count() or history.count() - before != count:
+            raise RuntimeError(f"Migrated {history.count() - before} of {source.count()} saved names from {json_path}.")
+        return count
+    finally:
+        history.close()
+        source.close()
@@ -0,0 +1,217 @@
+"""Opt-in counters and timing histograms for the tools.
+
+Set TTRPG_METRICS before starting (or pass --metrics to the command line
+interface) to record how often each instrumented function runs and how
+long it takes, along with file load/save times, bytes written and cache
+hit rates. A summary is written when the program exits:
+
+    TTRPG_METRICS=text          text summary on stderr
+    TTRPG_METRICS=json          JSON on stderr
+    TTRPG_METRICS=metrics.json  JSON written to a file (any other name gets text)
+
+Functions are wrapped by @timed only if metrics are enabled when their
+module is imported, so there is no cost at all when they are off. The tools
+are imported lazily, which lets main.py and the CLI enable metrics first.
+Generators of bulk output are timed one chunk at a time with timed_chunks.
+
+TTRPG_PROFILE=session.pstats (or --profile) runs the whole session under
+cProfile instead; see profiled().
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+class Histogram:
+    """Call durations in power-of-two microsecond buckets"""
+    __slots__ = ("count", "total", "minimum", "maximum", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+        self.buckets = {}
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.minimum = min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+        bucket = int(seconds * 1e6).bit_length()  # bucket b holds durations below 2**b microseconds
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, q):
+        """Upper bound (in seconds) of the bucket holding the q-th percentile"""
+        target = self.count * q / 100
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(2 ** bucket / 1e6, self.maximum)
+        return self.maximum
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1e3,
+            "mean_us": self.total / self.count * 1e6 if self.count else 0.0,
+            "min_us": self.minimum * 1e6 if self.count else 0.0,
+            "p50_us": self.percentile(50) * 1e6,
+            "p95_us": self.percentile(95) * 1e6,
+            "max_us": self.maximum * 1e6,
+            "buckets_us": {f"<{2 ** bucket}": n for bucket, n in sorted(self.buckets.items())},
+        }
+
+
+class Metrics:
+    """Process-wide counters and timing histograms"""
+
+    def __init__(self):
+        self.enabled = False
+        self.output = None
+        self.counters = {}
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def enable(self, output="text"):
+        """Start recording, and report to output when the program exits"""
+        if not self.enabled:
+            atexit.register(self.report)
+        self.enabled = True
+        self.output = output
+
+    def count(self, name, amount=1):
+        """Add amount to a counter (does nothing while disabled)"""
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name, seconds):
+        """Add one duration to a timing histogram"""
+        with self._lock:
+            histogram = self.timings.get(name)
+            if histogram is None:
+                histogram = self.timings[name] = Histogram()
+            histogram.add(seconds)
+
+    def cache_stats(self):
+        """Hit rates of the lru caches in modules that have been imported"""
+        caches = {}
+        dice = sys.modules.get("ttrpg_tools.dice")
+        if dice is not None:
+            for name in ("compile_expression", "_cached_distribution", "_die_distribution"):
+                info = getattr(dice, name).cache_info()
+                lookups = info.hits + info.misses
+                caches[f"dice.{name}"] = {"hits": info.hits, "misses": info.misses, "hit_rate": info.hits / lookups if lookups else 0.0}
+        hits, misses = self.counters.get("registry.hits", 0), self.counters.get("registry.misses", 0)
+        if hits or misses:
+            caches["registry"] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+        return caches
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "counters": dict(sorted(self.counters.items())),
+                "timings": {name: histogram.to_dict() for name, histogram in sorted(self.timings.items())},
+                "caches": self.cache_stats(),
+            }
+
+    def summary(self):
+        """Human-readable report"""
+        data = self.to_dict()
+        lines = ["TTRPG tools metrics", f"{'timing':<40}{'calls':>9}{'total ms':>11}{'mean us':>10}{'p95 us':>10}{'max us':>10}"]
+        for name, timing in data["timings"].items():
+            lines.append(
+                f"{name:<40}{timing['count']:>9}{timing['total_ms']:>11.1f}{timing['mean_us']:>10.1f}"
+                f"{timing['p95_us']:>10.0f}{timing['max_us']:>10.0f}"
+            )
+        if data["counters"]:
+            lines.append(f"{'counter':<40}{'value':>9}")
+            lines.extend(f"{name:<40}{value:>9}" for name, value in data["counters"].items())
+        if data["caches"]:
+            lines.append(f"{'cache':<40}{'hits':>9}{'misses':>11}{'hit rate':>10}")
+            lines.extend(
+                f"{name:<40}{cache['hits']:>9}{cache['misses']:>11}{cache['hit_rate']:>10.1%}"
+                for name, cache in data["caches"].items()
+            )
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """Write the report to the configured output"""
+        output = self.output or "text"
+        try:
+            if output in ("1", "text"):
+                sys.stderr.write(self.summary())
+            elif output == "json":
+                sys.stderr.write(json.dumps(self.to_dict(), indent=2) + "\n")
+            else:
+                with open(output, 'w', encoding="utf-8") as file:
+                    if output.lower().endswith(".json"):
+                        json.dump(self.to_dict(), file, indent=2)
+                    else:
+                        file.write(self.summary())
+        except Exception as e:
+            print(f"Error writing metrics: {e}", file=sys.stderr)
+
+
+metrics = Metrics()
+count = metrics.count
+
+
+def timed(name):
+    """Decorator recording the duration of every call under name (only if metrics are enabled)"""
+    def decorate(function):
+        if not metrics.enabled:
+            return function
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def timed_chunks(name, chunks):
+    """Iterate over chunks, recording how long each one takes to produce under name (only if metrics are enabled)"""
+    if not metrics.enabled:
+        return iter(chunks)
+    return _timed_chunks(name, iter(chunks))
+
+
+def _timed_chunks(name, chunks):
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        metrics.record(name, time.perf_counter() - start)
+        yield chunk
+
+
+@contextmanager
+def profiled(path):
+    """Run the block under cProfile and write the stats to path (view with python -m pstats)"""
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}", file=sys.stderr)
+
+
+if os.environ.get("TTRPG_METRICS"):
+    metrics.enable(os.environ["TTRPG_METRICS"])
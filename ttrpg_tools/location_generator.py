@@ -1,56 +1,144 @@
-import random
-import json
-import os
-from datetime import datetime
+from contextlib import contextmanager
+from itertools import islice
 
+from ttrpg_tools.history import open_history
+from ttrpg_tools.instrument import timed
+from ttrpg_tools.permutation import distinct, iter_unique_combinations, unique_capacity
+from ttrpg_tools.registry import registry
+from ttrpg_tools.rng import make_rng
+from ttrpg_tools.search import SavedNameIndex
+from ttrpg_tools.storage import DeferredSaves, save_data
+from ttrpg_tools.tables import GroupedTable, SamplingTable
 
-class LocationNameGenerator:
+
+LOCATION_DATA_NAME = "Fantasy_locations.json"  # capitalized, as the shipped file is checked in
+LOCATION_DATA_FILE = "data/" + LOCATION_DATA_NAME
+
+class LocationTables:
+    """Compiled sampling tables for location names"""
+    __slots__ = ("terrain_categories", "terrain", "prefixes", "suffixes")
+
+    def __init__(self, location_data):
+        self.terrain = {category: SamplingTable(names) for category, names in location_data["terrain"].items()}
+        self.terrain_categories = tuple(self.terrain)
+        self.prefixes = GroupedTable(location_data["prefixes"].values())
+        self.suffixes = GroupedTable(location_data["suffixes"].values())
+
+    def add(self, location_data, component_type, category, new_components):
+        """Update only the table that new components were added to"""
+        if component_type == "terrain":
+            table = self.terrain.get(category)
+            self.terrain[category] = table.extended(new_components) if table else SamplingTable(new_components)
+            self.terrain_categories = tuple(self.terrain)
+        else:
+            setattr(self, component_type, GroupedTable(location_data[component_type].values()))
+
+
+def terrain_categories(data_file=LOCATION_DATA_FILE):
+    """Terrain categories of a location data file (empty if the file does not exist yet)"""
+    location_data, _ = registry.load(data_file)
+    if location_data is None:
+        return ()
+    return registry.derived(data_file, "location_tables", LocationTables).terrain_categories
+
+
+def draw_location_name(tables, rng, terrain=None):
+    """Draw one location name from LocationTables"""
+    # If no specific terrain is provided, choose a random terrain
+    if not terrain:
+        terrain = rng.choice(tables.terrain_categories)
+    
+    # Select random components (category first, then a component from it)
+    prefix = tables.prefixes.draw(rng)
+    terrain_type = tables.terrain[terrain].draw(rng)
+    suffix = tables.suffixes.draw(rng)
+    
+    # Combine to create location name
+    if rng.random() < 0.5:
+        # Prefix + Terrain + Suffix
+        return f"{prefix} {terrain_type} of the {suffix}"
+    # Terrain of the Prefix Suffix
+    return f"{terrain_type} of the {prefix} {suffix}"
+
+
+@timed("locations.draw_location_names")
+def draw_location_names(tables, rng, count, terrain=None):
+    """Draw count location names from LocationTables"""
+    return [draw_location_name(tables, rng, terrain) for _ in range(count)]
+
+
+def render_location_name(combination):
+    """Location name for a (prefix, terrain, suffix, pattern) combination from unique_location_parts"""
+    prefix, terrain_type, suffix, pattern = combination
+    return pattern.format(prefix=prefix, terrain=terrain_type, suffix=suffix)
+
+
+def format_saved_name(number, entry):
+    """Format one saved-name entry for display"""
+    row = f"{number}. {entry['name']} (Saved: {entry['timestamp']})"
+    if entry.get("tags"):
+        row += f" [Tags: {', '.join(entry['tags'])}]"
+    return row
+
+
+class LocationNameGenerator(DeferredSaves):
     """A generator for fantasy location names"""
-    def __init__(self, data_file="data/fantasy_locations.json", history_file="data/fantasy_locations_history.json"):
+    def __init__(self, data_file=LOCATION_DATA_FILE, history_file="data/fantasy_locations_history.json", rng=None):
         self.data_file = data_file
         self.history_file = history_file
+        self.rng = make_rng(rng)
         self.location_data = {}
-        self.name_history = {}
+        self.tables = None
+        self.history = None
+        self.index = None
         self.load_location_data()
         self.load_name_history()
 
 
+    @timed("locations.load_location_data")
     def load_location_data(self):
         """Load location name data from the JSON file"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as file:
-                    self.location_data = json.load(file)
-                print(f"Successfully loaded location name data from {self.data_file}")
+            location_data, loaded = registry.load(self.data_file)
+            if location_data is not None:
+                self.location_data = location_data
+                self.tables = registry.derived(self.data_file, "location_tables", LocationTables)
+                if loaded:
+                    print(f"Successfully loaded location name data from {self.data_file}")
                 
             else:
                 print(f"Data file {self.data_file} not found. Creating with default location name components.")
                 self.create_default_location_data()
+                self.compile_tables()
                 self.save_location_data()
                 
         except Exception as e:
             print(f"Error loading location name data: {e}")
             print("Creating default location name data instead.")
             self.create_default_location_data()
+            self.compile_tables()
             self.save_location_data()
 
 
+    def compile_tables(self):
+        """Rebuild the sampling tables after the location data changed"""
+        self.tables = LocationTables(self.location_data)
+
+
+    @timed("locations.load_name_history")
     def load_name_history(self):
-        """Load previously generated and saved names"""
-        try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as file:
-                    self.name_history = json.load(file)
-                print(f"Successfully loaded name history from {self.history_file}")
-                
-            else:
-                self.name_history = {"saved_names": []}
-                self.save_name_history()
-                
-        except Exception as e:
-            print(f"Error loading name history: {e}")
-            self.name_history = {"saved_names": []}
-            self.save_name_history()
+        """Load previously generated and saved names (JSON file or SQLite database)"""
+        if self.history is not None:
+            self.history.close()
+        self.history = open_history(self.history_file)
+        self.index = None
+
+
+    @contextmanager
+    def batch(self):
+        """Defer saves of both the location data and the name history"""
+        with DeferredSaves.batch(self), self.history.batch():
+            yield self
 
 
     def create_default_location_data(self):
@@ -92,88 +180,112 @@ class LocationNameGenerator:
             }
         }
     
+    @timed("locations.save_location_data")
     def save_location_data(self):
         """Save the current location name data to the JSON file"""
+        if self.defer_save(self.save_location_data):
+            return
+        
         try:
-            with open(self.data_file, 'w') as file:
-                json.dump(self.location_data, file, indent=2)
+            save_data(self.location_data, self.data_file)
+            registry.store(self.data_file, self.location_data)
             print(f"Successfully saved location name data to {self.data_file}")
             
         except Exception as e:
             print(f"Error saving location name data: {e}")
     
     def save_name_history(self):
-        """Save the name history to the JSON file"""
-        try:
-            with open(self.history_file, 'w') as file:
-                json.dump(self.name_history, file, indent=2)
-            print(f"Successfully saved name history to {self.history_file}")
-            
-        except Exception as e:
-            print(f"Error saving name history: {e}")
+        """Save the name history"""
+        self.history.save()
 
 
+    @timed("locations.generate_location_name")
     def generate_location_name(self, terrain=None):
         """Generate a location name"""
-        # If no specific terrain is provided, choose a random terrain
-        if not terrain:
-            terrain_categories = list(self.location_data["terrain"].keys())
-            terrain = random.choice(terrain_categories)
-        
-        # Choose components
-        prefix_category = random.choice(list(self.location_data["prefixes"].keys()))
-        suffix_category = random.choice(list(self.location_data["suffixes"].keys()))
-        
-        # Select random components
-        prefix = random.choice(self.location_data["prefixes"][prefix_category])
-        terrain_type = random.choice(self.location_data["terrain"][terrain])
-        suffix = random.choice(self.location_data["suffixes"][suffix_category])
-        
-        # Combine to create location name
-        if random.random() < 0.5:
-            # Prefix + Terrain + Suffix
-            location_name = f"{prefix} {terrain_type} of the {suffix}"
-            
+        return draw_location_name(self.tables, self.rng, terrain)
+
+
+    @timed("locations.generate_multiple_location_names")
+    def generate_multiple_location_names(self, terrain=None, count=5):
+        """Generate multiple location names"""
+        return draw_location_names(self.tables, self.rng, count, terrain)
+
+
+    def unique_location_parts(self, terrain=None):
+        """Distinct components (and the two name patterns) used for unique generation"""
+        tables = self.tables
+        if terrain:
+            terrain_names = tables.terrain[terrain].items
         else:
-            # Terrain of the Prefix Suffix
-            location_name = f"{terrain_type} of the {prefix} {suffix}"
-        
-        return location_name
+            terrain_names = [name for category in tables.terrain_categories for name in tables.terrain[category].items]
+        return (
+            distinct(item for group in tables.prefixes.groups for item in group.items),
+            distinct(terrain_names),
+            distinct(item for group in tables.suffixes.groups for item in group.items),
+            ("{prefix} {terrain} of the {suffix}", "{terrain} of the {prefix} {suffix}"),
+        )
+
+
+    def unique_location_capacity(self, terrain=None):
+        """How many component combinations the terrain has (at most this many unique location names)"""
+        return unique_capacity(self.unique_location_parts(terrain))
 
 
+    def iter_unique_location_names(self, terrain=None, count=None):
+        """Iterator over location names that never repeat.
+
+        Raises ValueError right away if count is negative or exceeds
+        unique_location_capacity(terrain); count=None yields every name.
+        """
+        return iter_unique_combinations(self.unique_location_parts(terrain), self.rng, count, render_location_name)
+
+
+    @timed("locations.save_generated_name")
     def save_generated_name(self, name, tags=None):
         """Save a generated name to the history"""
-        save_entry = {
-            "name": name,
-            "timestamp": datetime.now().isoformat(),
-            "tags": tags or []
-        }
-        
-        # Add to saved names
-        self.name_history["saved_names"].append(save_entry)
-        self.save_name_history()
+        entry = self.history.add(name, tags)
+        if self.index is not None:
+            self.index.add(entry)
         return f"Saved location name: {name}"
 
 
+    @timed("locations.search_saved_names")
+    def search_saved_names(self, all_tags=(), any_tags=(), prefix=None, fuzzy=None, limit=None):
+        """Search saved names by tags (AND/OR), name prefix and fuzzy name match.
+
+        The search index is built from the history on first use and then kept
+        up to date by save_generated_name.
+        """
+        if self.index is None:
+            self.index = SavedNameIndex(self.history.entries())
+        return self.index.search(all_tags, any_tags, prefix, fuzzy, limit)
+
+
     def list_saved_names(self, filter_tag=None):
         """List saved names, optionally filtered by tag"""
-        saved_names = self.name_history["saved_names"]
-        
-        if filter_tag:
-            saved_names = [entry for entry in saved_names if filter_tag in entry.get("tags", [])]
+        rows = list(self.iter_saved_names(filter_tag))
         
-        if not saved_names:
+        if not rows:
             return "No saved names found."
         
-        # Format the output
-        output = "Saved Location Names:\n"
-        for i, entry in enumerate(saved_names, 1):
-            output += f"{i}. {entry['name']} (Saved: {entry['timestamp']})"
-            if entry.get("tags"):
-                output += f" [Tags: {', '.join(entry['tags'])}]"
-            output += "\n"
-        
-        return output
+        return "Saved Location Names:\n" + "\n".join(rows) + "\n"
+
+
+    def iter_saved_names(self, filter_tag=None, sort="saved", descending=False, offset=0, limit=None):
+        """Lazily yield formatted rows for one page of saved names"""
+        entries = self.history.iter_entries(filter_tag or None, sort, descending, offset, limit)
+        for number, entry in enumerate(entries, offset + 1):
+            yield format_saved_name(number, entry)
+
+
+    def iter_saved_name_pages(self, page_size=20, filter_tag=None, sort="saved", descending=False):
+        """Yield pages (lists of formatted rows) from a single lazy cursor over the saved names"""
+        rows = self.iter_saved_names(filter_tag, sort, descending)
+        while True:
+            page = list(islice(rows, page_size))
+            if not page:
+                return
+            yield page
 
 
     def add_location_name_component(self, component_type, category, new_components):
@@ -198,5 +310,6 @@ class LocationNameGenerator:
             self.location_data[component_type][category] = new_components
         
         # Save the updated data
+        self.tables.add(self.location_data, component_type, category, new_components)
         self.save_location_data()
         return f"Added new components to {component_type} - {category}"
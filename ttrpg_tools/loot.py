@@ -0,0 +1,317 @@
+"""Treasure hoards rolled from loot tables keyed by terrain and party level.
+
+data/loot_tables.json holds named tables plus a hoard table for every
+terrain category (the ones LocationNameGenerator uses) and level band:
+
+    {"default_terrain": "generic",
+     "hoards": {"generic": {"1-4": <table>, "5-10": <table>, ...}, ...},
+     "tables": {"gems-10": <table>, ...}}
+
+A table is a list of entries, or {"always": [parts], "entries": [entries]}
+when some parts are rolled on every use. An entry is an item name, or a
+dict with any of "text", "value" (in gp), "weight" (default 1) and
+"loot" (a list of parts). A part is an item name, coins such as
+{"dice": "6d6", "times": 100, "unit": "cp"}, or a nested roll such as
+{"dice": "1d4", "table": "gems-10"} ("roll 1d4 times on gems-10").
+
+Tables are compiled into cumulative weights, so picking an entry is one
+random number and a bisection. roll_hoards rolls many hoards at once: each
+table is rolled for every hoard that reaches it in a single batch, and all
+dice of a part come from one dice.roll_many call.
+"""
+from bisect import bisect
+from itertools import accumulate
+
+from ttrpg_tools import dice
+from ttrpg_tools.instrument import timed
+from ttrpg_tools.registry import registry
+from ttrpg_tools.rng import make_rng, numpy_module
+
+
+COIN_VALUES = {"cp": 0.01, "sp": 0.1, "ep": 0.5, "gp": 1, "pp": 10}
+MAX_DEPTH = 8  # nested table rolls deeper than this are ignored (guards against cycles)
+
+
+def parse_band(band):
+    """(lowest, highest) level of a band such as '5-10' or '20'"""
+    low, _, high = band.partition("-")
+    return int(low), int(high or low)
+
+
+class LootEntry:
+    """One compiled row of a loot table"""
+    __slots__ = ("text", "value", "parts")
+
+    def __init__(self, text, value, parts):
+        self.text = text
+        self.value = value
+        self.parts = parts
+
+
+class LootTable:
+    """Entries with cumulative weights, picked by bisection"""
+    __slots__ = ("name", "always", "entries", "cumulative", "total", "_array")
+
+    def __init__(self, name, always, entries, weights):
+        self.name = name
+        self.always = always
+        self.entries = entries
+        self.cumulative = tuple(accumulate(weights))
+        self.total = self.cumulative[-1] if self.cumulative else 0
+        self._array = None
+
+    def pick_many(self, rng, count):
+        """Indices of count random entries (rng is a NumPy Generator when NumPy is installed)"""
+        np = numpy_module()
+        if np is None:
+            cumulative, total, random = self.cumulative, self.total, rng.random
+            return [bisect(cumulative, random() * total) for _ in range(count)]
+        if self._array is None:
+            self._array = np.array(self.cumulative, dtype=np.float64)
+        return np.searchsorted(self._array, rng.random(count) * self.total, side="right").tolist()
+
+
+def compile_part(part):
+    """("item", text, value), ("coins", roll, times, unit) or ("table", roll, name)"""
+    if isinstance(part, str):
+        return ("item", part, 0)
+    roll = dice.compile_expression(str(part.get("dice", "1")))
+    if "table" in part:
+        return ("table", roll, part["table"])
+    if "unit" in part:
+        unit = part["unit"].lower()
+        if unit not in COIN_VALUES:
+            raise ValueError(f"Unknown coin '{unit}'. Use one of: {', '.join(COIN_VALUES)}.")
+        return ("coins", roll, int(part.get("times", 1)), unit)
+    return ("item", part["text"], part.get("value", 0))
+
+
+def compile_table(name, table):
+    """Compile one table from the data file"""
+    if isinstance(table, dict):
+        always, rows = table.get("always", ()), table.get("entries", ())
+    else:
+        always, rows = (), table
+    entries, weights = [], []
+    for row in rows:
+        if isinstance(row, str):
+            row = {"text": row}
+        parts = tuple(compile_part(part) for part in row.get("loot", ()))
+        entries.append(LootEntry(row.get("text"), row.get("value", 0), parts))
+        weights.append(row.get("weight", 1))
+    return LootTable(name, tuple(compile_part(part) for part in always), tuple(entries), weights)
+
+
+class LootTables:
+    """Compiled named tables and hoard tables for a loot data file"""
+    __slots__ = ("tables", "hoards", "bands", "default_terrain")
+
+    def __init__(self, loot_data):
+        self.tables = {name: compile_table(name, table) for name, table in loot_data.get("tables", {}).items()}
+        self.hoards = {}
+        bands = set()
+        for terrain, by_band in loot_data.get("hoards", {}).items():
+            self.hoards[terrain] = {}
+            for band, table in by_band.items():
+                self.hoards[terrain][parse_band(band)] = compile_table(f"{terrain} {band}", table)
+                bands.add(parse_band(band))
+        self.bands = tuple(sorted(bands))
+        self.default_terrain = loot_data.get("default_terrain", next(iter(self.hoards), None))
+
+        for table in (*self.tables.values(), *(t for by_band in self.hoards.values() for t in by_band.values())):
+            for part in (*table.always, *(part for entry in table.entries for part in entry.parts)):
+                if part[0] == "table" and part[2] not in self.tables:
+                    raise ValueError(f"Loot table '{table.name}' rolls on unknown table '{part[2]}'.")
+
+    def hoard_table(self, terrain, level):
+        """Hoard table for a terrain category and party level, or None"""
+        by_band = self.hoards.get(terrain) or self.hoards.get(self.default_terrain) or {}
+        for (low, high), table in by_band.items():
+            if low <= level <= high:
+                return table
+        return None
+
+
+class Hoard:
+    """Coins and items found together"""
+    __slots__ = ("coins", "items", "value")
+
+    def __init__(self):
+        self.coins = {}
+        self.items = {}  # text -> [count, value each]
+        self.value = 0.0  # in gp
+
+    def add_coins(self, unit, amount):
+        self.coins[unit] = self.coins.get(unit, 0) + amount
+        self.value += amount * COIN_VALUES[unit]
+
+    def add_item(self, text, value, count=1):
+        item = self.items.get(text)
+        if item is None:
+            self.items[text] = [count, value]
+        else:
+            item[0] += count
+        self.value += value * count
+
+    def __str__(self):
+        coins = ", ".join(f"{self.coins[unit]:,} {unit}" for unit in COIN_VALUES if self.coins.get(unit))
+        items = ", ".join(
+            f"{f'{count} x ' if count > 1 else ''}{text}{f' ({value:,g} gp)' if value else ''}"
+            for text, (count, value) in self.items.items()
+        )
+        return "; ".join(part for part in (coins, items) if part) or "Nothing of value"
+
+    def to_dict(self):
+        return {
+            "coins": {unit: self.coins[unit] for unit in COIN_VALUES if self.coins.get(unit)},
+            "items": [{"name": text, "count": count, "value": value} for text, (count, value) in self.items.items()],
+            "value": round(self.value, 2),
+        }
+
+
+def roll_hoards(tables, table, count, rng, batch_rng=None):
+    """Roll count hoards on a LootTable, batching every table, entry and part across the hoards.
+
+    rng is a random.Random used for the entry picks when NumPy is missing;
+    batch_rng (see dice.make_batch_rng) drives the vectorized picks and dice.
+    """
+    batch_rng = batch_rng if batch_rng is not None else dice.make_batch_rng(rng)
+    picker = batch_rng if numpy_module() is not None else make_rng(rng)
+    hoards = [Hoard() for _ in range(count)]
+    _roll_table(tables, table, list(range(count)), hoards, picker, batch_rng, 0)
+    return hoards
+
+
+def _roll_table(tables, table, owners, hoards, picker, batch_rng, depth):
+    """Roll once on table for every hoard number in owners"""
+    if not owners or depth > MAX_DEPTH:
+        return
+    for part in table.always:
+        _apply_part(tables, part, owners, hoards, picker, batch_rng, depth)
+    if not table.entries:
+        return
+    groups = {}
+    for owner, index in zip(owners, table.pick_many(picker, len(owners))):
+        groups.setdefault(index, []).append(owner)
+    for index, group in groups.items():
+        entry = table.entries[index]
+        if entry.text:
+            for owner in group:
+                hoards[owner].add_item(entry.text, entry.value)
+        for part in entry.parts:
+            _apply_part(tables, part, group, hoards, picker, batch_rng, depth)
+
+
+def _apply_part(tables, part, owners, hoards, picker, batch_rng, depth):
+    kind = part[0]
+    if kind == "item":
+        for owner in owners:
+            hoards[owner].add_item(part[1], part[2])
+        return
+    totals = dice.roll_many(part[1], len(owners), batch_rng)
+    if kind == "coins":
+        _, _, times, unit = part
+        for owner, total in zip(owners, totals.tolist()):
+            if total > 0:
+                hoards[owner].add_coins(unit, total * times)
+    else:
+        repeated = [owner for owner, total in zip(owners, totals.tolist()) for _ in range(total)]
+        _roll_table(tables, tables.tables[part[2]], repeated, hoards, picker, batch_rng, depth + 1)
+
+
+class LootGenerator:
+    """Rolls treasure hoards for a terrain category and party level"""
+    def __init__(self, data_file="data/loot_tables.json", location_file=None, rng=None):
+        self.data_file = data_file
+        self.location_file = location_file
+        self.rng = make_rng(rng)
+        self._batch_rng = None
+        self.loot_data = {}
+        self.tables = None
+        self.load_loot_tables()
+
+
+    @timed("loot.load_loot_tables")
+    def load_loot_tables(self):
+        """Load and compile the loot tables"""
+        try:
+            loot_data, loaded = registry.load(self.data_file)
+            if loot_data is None:
+                print(f"Loot table file {self.data_file} not found. No loot tables are available.")
+                return
+            self.loot_data = loot_data
+            self.tables = registry.derived(self.data_file, "loot_tables", LootTables)
+            if loaded:
+                print(f"Successfully loaded {len(self.tables.tables)} loot tables from {self.data_file}")
+
+        except Exception as e:
+            print(f"Error loading loot tables: {e}")
+
+
+    @property
+    def batch_rng(self):
+        """Random source for the vectorized rolls, derived from rng on first use"""
+        if self._batch_rng is None:
+            self._batch_rng = dice.make_batch_rng(self.rng)
+        return self._batch_rng
+
+
+    def terrain_categories(self):
+        """The location generator's terrain categories (or the loot file's, if it has no data file)"""
+        from ttrpg_tools.location_generator import LOCATION_DATA_FILE, terrain_categories
+        try:
+            categories = terrain_categories(self.location_file or LOCATION_DATA_FILE)
+        except Exception as e:
+            print(f"Error loading location data: {e}")
+            categories = ()
+        return categories or tuple(self.loot_data.get("hoards", ()))
+
+
+    def level_bands(self):
+        """Level bands of the hoard tables, e.g. ['1-4', '5-10']"""
+        if self.tables is None:
+            return []
+        return [f"{low}-{high}" if high != low else str(low) for low, high in self.tables.bands]
+
+
+    def hoard_table(self, terrain=None, level=1):
+        """Hoard table for a terrain category and party level; raises ValueError if there is none"""
+        if self.tables is None:
+            raise ValueError("No loot tables are available.")
+        terrain = (terrain or self.tables.default_terrain or "").lower()
+        if terrain not in self.tables.hoards and terrain not in self.terrain_categories():
+            raise ValueError(f"Unknown terrain '{terrain}'. Choose from: {', '.join(self.terrain_categories())}.")
+        table = self.tables.hoard_table(terrain, level)
+        if table is None:
+            raise ValueError(f"No hoard table covers level {level}. Level bands: {', '.join(self.level_bands())}.")
+        return table
+
+
+    @timed("loot.roll_hoards")
+    def roll_hoards(self, terrain=None, level=1, count=1):
+        """Roll count hoards in one vectorized pass (e.g. a whole dungeon's treasure)"""
+        return roll_hoards(self.tables, self.hoard_table(terrain, level), count, self.rng, self.batch_rng)
+
+
+    def roll_hoard(self, terrain=None, level=1):
+        """Roll one hoard, or return a message if there is no table for the terrain and level"""
+        try:
+            return self.roll_hoards(terrain, level, 1)[0]
+        except ValueError as e:
+            return str(e)
+
+
+    def roll_on_table(self, name, count=1):
+        """Roll count times on a named table (e.g. 'gems-50'), returning one Hoard of the results"""
+        if self.tables is None or name not in self.tables.tables:
+            return f"Unknown loot table '{name}'."
+        hoard = Hoard()
+        owners = [0] * count
+        picker = self.batch_rng if numpy_module() is not None else self.rng
+        _roll_table(self.tables, self.tables.tables[name], owners, [hoard], picker, self.batch_rng, 0)
+        return hoard
+
+
+    def get_table_names(self):
+        """Return the names of the loot tables"""
+        return list(self.tables.tables) if self.tables is not None else []
@@ -0,0 +1,236 @@
+"""Character-level Markov models for generating new names in a race's style.
+
+A model of order N learns which character follows every run of N characters
+in the training names. Transitions are compiled into a string of possible
+next characters plus a cumulative count array, sampled by bisection.
+
+With NumPy, MarkovSampler walks a whole batch of names at once: every
+context's cumulative counts are laid end to end in one array, so a single
+searchsorted call picks the next character of every name. Without NumPy it
+draws next characters per context in batches with random.choices, so each
+character costs little more than a list pop.
+
+Order 2 is the default: the shipped races have 16 prefixes and 16 suffixes
+each, and at order 3 most output just reproduces those combinations.
+"""
+import hashlib
+import json
+from collections import Counter, defaultdict
+from itertools import accumulate
+
+from ttrpg_tools.rng import make_numpy_rng, numpy_module
+from ttrpg_tools.tables import component_text
+
+
+START = "\x02"
+END = "\x03"
+DEFAULT_ORDER = 2
+
+
+def source_hash(races, order):
+    """Fingerprint of the training data, stored with the compiled models"""
+    payload = json.dumps([order, races], sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def training_names(parts):
+    """Names to train a race's model on: every prefix+suffix plus any imported names"""
+    prefixes = [component_text(prefix) for prefix in parts.get("prefixes", [])]
+    suffixes = [component_text(suffix) for suffix in parts.get("suffixes", [])]
+    names = {prefix + suffix for prefix in prefixes for suffix in suffixes}
+    names.update(parts.get("names", []))
+    return sorted(name for name in names if name)
+
+
+class MarkovNameModel:
+    """Compiled order-N transition tables for one race"""
+    __slots__ = ("order", "transitions", "known", "_arrays")
+
+    def __init__(self, order, transitions, known=()):
+        self.order = order
+        self.transitions = transitions  # context -> (next characters, cumulative counts)
+        self.known = frozenset(known)  # lower-cased training names
+        self._arrays = None
+
+    @classmethod
+    def train(cls, names, order=DEFAULT_ORDER):
+        """Count the transitions in names and compile them"""
+        counts = defaultdict(Counter)
+        for name in names:
+            padded = START * order + name.lower() + END
+            for i in range(order, len(padded)):
+                counts[padded[i - order:i]][padded[i]] += 1
+        transitions = {}
+        for context, followers in counts.items():
+            outcomes = "".join(sorted(followers))
+            transitions[context] = (outcomes, tuple(accumulate(followers[char] for char in outcomes)))
+        return cls(order, transitions, (name.lower() for name in names))
+
+    def to_dict(self):
+        return {
+            "order": self.order,
+            "transitions": {context: [outcomes, list(cumulative)] for context, (outcomes, cumulative) in self.transitions.items()},
+            "known": sorted(self.known),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        transitions = {context: (outcomes, tuple(cumulative)) for context, (outcomes, cumulative) in data["transitions"].items()}
+        return cls(data["order"], transitions, data.get("known", ()))
+
+    def arrays(self):
+        """NumPy form of the transitions, built on first use.
+
+        Returns (start, offsets, totals, bounds, next_states, letters, code_points,
+        first_code_points, known). Each context is a state; bounds holds every
+        state's cumulative counts shifted by the state's offset, and
+        next_states/letters give the state and letter each entry leads to.
+        Letter 0 is the end of the name, and the extra last state only leads
+        back to itself, so finished names stay finished.
+        """
+        if self._arrays is None:
+            np = numpy_module()
+            contexts = list(self.transitions)
+            states = {context: index for index, context in enumerate(contexts)}
+            done = len(contexts)
+            alphabet = sorted({char for outcomes, _ in self.transitions.values() for char in outcomes} - {END})
+            letter_of = {char: index + 1 for index, char in enumerate(alphabet)}
+
+            offsets, totals, bounds, next_states, letters = [], [], [], [], []
+            offset = 0
+            for context in contexts:
+                outcomes, cumulative = self.transitions[context]
+                offsets.append(offset)
+                totals.append(cumulative[-1])
+                for char, count in zip(outcomes, cumulative):
+                    bounds.append(offset + count)
+                    if char == END:
+                        next_states.append(done)
+                        letters.append(0)
+                    else:
+                        next_states.append(states[(context + char)[1:]])
+                        letters.append(letter_of[char])
+                offset += cumulative[-1]
+            offsets.append(offset)
+            totals.append(1)
+            bounds.append(offset + 1)
+            next_states.append(done)
+            letters.append(0)
+
+            self._arrays = (
+                states[START * self.order],
+                np.array(offsets, dtype=np.float64),
+                np.array(totals, dtype=np.float64),
+                np.array(bounds, dtype=np.float64),
+                np.array(next_states, dtype=np.int32),
+                np.array(letters, dtype=np.int32),
+                np.array([0] + [ord(char) for char in alphabet], dtype="<u4"),
+                np.array([0] + [ord(char.upper()[:1] or char) for char in alphabet], dtype="<u4"),
+                frozenset(name[:1].upper() + name[1:] for name in self.known),
+            )
+        return self._arrays
+
+
+class MarkovSampler:
+    """Generates names from a model with one random source.
+
+    Next characters are drawn per context in batches of batch_size; every
+    draw is still independent, so the names follow the model exactly.
+    """
+    batch_size = 256
+
+    def __init__(self, model, rng):
+        self.model = model
+        self.rng = rng
+        self.pools = {}
+        self._numpy_rng = None
+
+    def _refill(self, context):
+        outcomes, cumulative = self.model.transitions[context]
+        pool = self.rng.choices(outcomes, cum_weights=cumulative, k=self.batch_size)
+        self.pools[context] = pool
+        return pool
+
+    def generate(self, min_length=3, max_length=12, novel=True, attempts=100):
+        """One name of min_length..max_length letters; novel names are not in the training data"""
+        pools = self.pools
+        refill = self._refill
+        known = self.model.known if novel else ()
+        start = START * self.model.order
+        name = ""
+        for _ in range(attempts):
+            context = start
+            chars = []
+            while len(chars) <= max_length:
+                pool = pools.get(context) or refill(context)
+                char = pool.pop()
+                if char == END:
+                    break
+                chars.append(char)
+                context = context[1:] + char
+            else:
+                continue  # ran past max_length
+            name = "".join(chars)
+            if len(name) >= min_length and name not in known:
+                break
+        return name[:1].upper() + name[1:]
+
+    def generate_many(self, count, min_length=3, max_length=12, novel=True):
+        """A list of count names (generated in vectorized batches when NumPy is installed)"""
+        if count >= 64 and numpy_module() is not None:
+            return self._generate_many_numpy(count, min_length, max_length, novel)
+        generate = self.generate
+        return [generate(min_length, max_length, novel) for _ in range(count)]
+
+    def _generate_many_numpy(self, count, min_length, max_length, novel):
+        np = numpy_module()
+        if self._numpy_rng is None:
+            self._numpy_rng = make_numpy_rng(self.rng)
+        generator = self._numpy_rng
+        start, offsets, totals, bounds, next_states, letters, code_points, first_code_points, known = self.model.arrays()
+        done = len(offsets) - 1
+        names = []
+        batch = count
+        for _ in range(100):
+            states = np.full(batch, start, dtype=np.int32)
+            codes = np.empty((batch, max_length + 1), dtype=np.int32)
+            for step in range(max_length + 1):
+                targets = offsets[states] + generator.random(batch) * totals[states]
+                entries = np.searchsorted(bounds, targets, side="right")
+                codes[:, step] = letters[entries]
+                states = next_states[entries]
+            lengths = np.count_nonzero(codes, axis=1)
+            keep = (states == done) & (lengths >= min_length)
+            codes = codes[keep, :max_length]
+
+            points = code_points[codes]
+            points[:, 0] = first_code_points[codes[:, 0]]
+            batch_names = points.view(f"<U{max_length}").ravel().tolist()
+            if novel:
+                batch_names = [name for name in batch_names if name not in known]
+            names.extend(batch_names)
+            if len(names) >= count:
+                return names[:count]
+            # Size the next batch from the acceptance rate seen so far
+            accepted = max(len(batch_names), 1) / batch
+            batch = int((count - len(names)) / accepted * 1.1) + 64
+        names.extend(self.generate(min_length, max_length, novel) for _ in range(count - len(names)))
+        return names
+
+
+def draw_markov_names(model, rng, count):
+    """Draw function (see ttrpg_tools.parallel) producing count names from a model"""
+    return MarkovSampler(model, rng).generate_many(count)
+
+
+def train_models(races, order=DEFAULT_ORDER):
+    """Train {race: MarkovNameModel} from race data"""
+    return {race: MarkovNameModel.train(training_names(parts), order) for race, parts in races.items()}
+
+
+def models_to_dict(models, source):
+    return {"source": source, "races": {race: model.to_dict() for race, model in models.items()}}
+
+
+def models_from_dict(data):
+    return {race: MarkovNameModel.from_dict(model) for race, model in data["races"].items()}
@@ -1,28 +1,35 @@
 import os
 import sys
-from ttrpg_tools.dice import Dice
-from ttrpg_tools.location_generator import LocationNameGenerator
-from ttrpg_tools.name_generator import NameGenerator
-from ttrpg_tools.title_generator import TitleGenerator
+from ttrpg_tools.rng import SeedStream
+from ttrpg_tools.tables import format_component, parse_component
+
+# The tools themselves are imported inside the menus that use them, so
+# launching only pays for the ones that are actually opened.
 
 
 """ defines how CLEAR functions based on the platform"""
 if sys.platform in ('linux', 'darwin'):
-    CLEAR = 'clear'
+    CLEAR = '\033[H\033[2J\033[3J'  # ANSI escape codes, no need to spawn `clear`
 elif sys.platform == 'win32':
     CLEAR = 'cls'
 else:
     print('Platfrom not supported', file=sys.stderr)
     exit(1)
 
+WEIGHT_HINT = "(add :weight to make a component more or less common, e.g. 'the Great:3' or 'the Magnificent:0.5')"
+
 
 class Menu:
     """Class to handle the main menu and user input"""
-    def __init__(self):
-        self.main_options = {1:"Roll dice", 2:"Generate a name",3:"Generate a title", 4:"Generate a location", 5:"Quit"}
-        self.name_options = {1:"Generate names", 2:"Add another race", 3:"Delete race", 4:"List available races", 6:"Quit"}
+    def __init__(self, seed=None):
+        self.seeds = SeedStream(seed)
+        self.main_options = {1:"Roll dice", 2:"Generate a name",3:"Generate a title", 4:"Generate a location", 5:"Build an encounter", 6:"Roll loot", 7:"Quit"}
+        self.name_options = {1:"Generate names", 2:"Add another race", 3:"Delete race", 4:"List available races", 5:"Write names to a file", 6:"Import a name list", 7:"Quit"}
         self.title_options = {1:"Generate a title", 2:"Add title components", 3:"Quit"}
+        self.page_size = 20
         self.location_options = {1:"Generate a location name", 2:"Save Generated Name", 3:"List Saved Names", 4:"Add Location Name Components", 5:"Quit"}
+        self.encounter_options = {1:"Build encounters", 2:"List monsters", 3:"Quit"}
+        self.loot_options = {1:"Roll treasure hoards", 2:"Roll a whole dungeon's hoards", 3:"Roll on a loot table", 4:"Quit"}
 
                 
     def print_options(self, options):
@@ -38,7 +45,7 @@ class Menu:
             self.print_options(self.main_options)
             user_input = input("What would you like to do? (q to quit) ")
             
-            if user_input.lower() == "q" or user_input == "5":
+            if user_input.lower() == "q" or user_input == "7":
                 clear_term()
                 break
             
@@ -58,6 +65,14 @@ class Menu:
                 clear_term()
                 self.menu_location_names()
             
+            elif user_input == "5":
+                clear_term()
+                self.menu_encounters()
+            
+            elif user_input == "6":
+                clear_term()
+                self.menu_loot()
+            
             else:
                 clear_term()
                 print("Invalid input. Please try again.")
@@ -65,12 +80,13 @@ class Menu:
 
     def menu_generate_names(self):
         """Menu for generating names based on user input"""
-        name_generator = NameGenerator()
+        from ttrpg_tools.name_generator import NameGenerator
+        name_generator = NameGenerator(rng=self.seeds.spawn(1)[0])
         while True:
             self.print_options(self.name_options)
             user_input = input("What would you like to do? (q to quit) ")
             
-            if user_input.lower() == "q" or user_input == "5":
+            if user_input.lower() == "q" or user_input == "7":
                 clear_term()
                 break
             
@@ -90,6 +106,14 @@ class Menu:
                 clear_term()
                 self.list_races(name_generator)
             
+            elif user_input == "5":
+                clear_term()
+                self.write_fantasy_names(name_generator)
+            
+            elif user_input == "6":
+                clear_term()
+                self.import_name_list(name_generator)
+            
             else:
                 clear_term()
                 print("Invalid input. Please try again.")
@@ -97,7 +121,8 @@ class Menu:
 
     def menu_generate_titles(self):
         """Menu for generating titles based on user input"""
-        title_generator = TitleGenerator()
+        from ttrpg_tools.title_generator import TitleGenerator
+        title_generator = TitleGenerator(rng=self.seeds.spawn(1)[0])
         while True:
             self.print_options(self.title_options)
             user_input = input("What would you like to do? (q to quit) ")
@@ -121,29 +146,87 @@ class Menu:
 
     def menu_location_names(self):
         """Menu for generating location names based on user input"""
-        location_generator = LocationNameGenerator()
+        from ttrpg_tools.location_generator import LocationNameGenerator
+        location_generator = LocationNameGenerator(rng=self.seeds.spawn(1)[0])
         saved_names = []
+        try:
+            while True:
+                self.print_options(self.location_options)
+                user_input = input("What would you like to do? (q to quit) ")
+            
+                if user_input == '1':
+                    clear_term()
+                    self.generate_location_name(location_generator)
+                
+                elif user_input == '2':
+                    clear_term()
+                    saved_names = self.save_generated_name(location_generator)
+                
+                elif user_input == '3':
+                    clear_term()
+                    self.list_saved_names(location_generator)
+                
+                elif user_input == '4':
+                    clear_term()
+                    self.add_location_components(location_generator)    
+                
+                elif user_input == '5' or user_input.lower() == 'q':
+                    clear_term()
+                    break
+            
+                else:
+                    clear_term()
+                    print("Invalid choice. Please try again.")
+        finally:
+            location_generator.history.close()  # flush saved names and release the journal
+
+
+    def menu_encounters(self):
+        """Menu for building encounters based on user input"""
+        from ttrpg_tools.encounter import EncounterBuilder
+        encounter_builder = EncounterBuilder(rng=self.seeds.spawn(1)[0])
         while True:
-            self.print_options(self.location_options)
+            self.print_options(self.encounter_options)
             user_input = input("What would you like to do? (q to quit) ")
             
             if user_input == '1':
                 clear_term()
-                self.generate_location_name(location_generator)
+                self.build_encounters(encounter_builder)
                 
             elif user_input == '2':
                 clear_term()
-                saved_names = self.save_generated_name(location_generator)
+                self.list_monsters(encounter_builder)
                 
-            elif user_input == '3':
+            elif user_input == '3' or user_input.lower() == 'q':
+                clear_term()
+                break
+            
+            else:
                 clear_term()
-                self.list_saved_names(location_generator, saved_names)
+                print("Invalid choice. Please try again.")
+
+
+    def menu_loot(self):
+        """Menu for rolling loot based on user input"""
+        from ttrpg_tools.loot import LootGenerator
+        loot_generator = LootGenerator(rng=self.seeds.spawn(1)[0])
+        while True:
+            self.print_options(self.loot_options)
+            user_input = input("What would you like to do? (q to quit) ")
+            
+            if user_input == '1':
+                clear_term()
+                self.roll_hoards(loot_generator)
                 
-            elif user_input == '4':
+            elif user_input == '2':
                 clear_term()
-                self.add_location_components(location_generator)    
+                self.roll_dungeon_hoards(loot_generator)
                 
-            elif user_input == '3' or user_input.lower() == 'q':
+            elif user_input == '3':
+                clear_term()
+                self.roll_loot_table(loot_generator)
+                
+            elif user_input == '4' or user_input.lower() == 'q':
                 clear_term()
                 break
             
@@ -154,6 +237,8 @@ class Menu:
 
     def roll_dice(self):
         """Roll dice based on user input"""
+        from ttrpg_tools.dice import Dice, DiceError
+        rng = self.seeds.spawn(1)[0].random()
         while True:
             user_input = input("What dice and how many would you like to roll? (q to quit) ")
                     
@@ -161,9 +246,14 @@ class Menu:
                 clear_term()
                 break
             
-            clear_term()        
-            dice = Dice(user_input)
-            dice.roll()
+            clear_term()
+            try:
+                dice = Dice(user_input, rng)
+            except DiceError as e:
+                print(f"Invalid input: {e}")
+                print("Use the format XdY with optional modifiers (e.g., 1d20+5, 4d6kh3, 2d20 keep highest + 7, 1d6!).")
+                continue
+            print(dice.roll())
 
     ### Fantasy Names related methods
     
@@ -191,12 +281,64 @@ class Menu:
             count = 5
             print(f"Using default count of {count}.")
         
+        style = input("Combine name parts (1) or invent new names from the race's style (2)? [1]: ").strip()
+        
         print(f"\n{race.capitalize()} names:")
-        names = generator.generate_multiple_names(race, count)
+        if style == "2":
+            names = generator.generate_multiple_markov_names(race, count)
+        else:
+            names = generator.generate_multiple_names(race, count)
         for i, name in enumerate(names, 1):
             print(f"{i}. {name}")
 
 
+    def write_fantasy_names(self, generator):
+        """Write a large batch of names for a race to a text file"""
+        
+        available_races = generator.get_available_races()
+        
+        if not available_races:
+            print("No races available. Please add a race first.")
+            return
+        
+        print("\nAvailable races: " + ", ".join(available_races))
+        race = input("Enter a race to generate names for: ")
+        
+        if generator.get_race_table(race) is None:
+            print(generator.unknown_race_message(race))
+            return
+        
+        try:
+            count = max(1, int(input("How many names would you like to generate? ")))
+        except ValueError:
+            print("Invalid count.")
+            return
+        
+        path = input("Enter the file to write to (.txt, .csv, .jsonl or .md for a roll table): ").strip()
+        from ttrpg_tools.export import export_to_file
+        try:
+            written = export_to_file(generator.iter_name_chunks(race, count), path, field="name", die=count)
+        except OSError as e:
+            print(f"Error writing names: {e}")
+            return
+        print(f"Wrote {written} {race.lower()} names to {path}")
+
+
+    def import_name_list(self, generator):
+        """Import whole names (one per line) to train a race's name style"""
+        available_races = generator.get_available_races()
+        print("\nAvailable races: " + ", ".join(available_races))
+        race = input("Enter the race the names belong to: ")
+        path = input("Enter the file to import (one name per line): ").strip()
+        try:
+            with open(path, 'r', encoding="utf-8") as file:
+                names = file.read().splitlines()
+        except OSError as e:
+            print(f"Error reading names: {e}")
+            return
+        print(generator.import_names(race, names))
+
+
     def add_new_race(self, generator):
         """Add a new race to the name_generator"""
         
@@ -209,13 +351,14 @@ class Menu:
                 print("Operation cancelled.")
                 return
         
+        print(WEIGHT_HINT)
         print("Enter prefixes (comma-separated):")
         prefixes_input = input("> ")
-        prefixes = [prefix.strip() for prefix in prefixes_input.split(",")]
+        prefixes = [parse_component(prefix) for prefix in prefixes_input.split(",")]
         
         print("Enter suffixes (comma-separated):")
         suffixes_input = input("> ")
-        suffixes = [suffix.strip() for suffix in suffixes_input.split(",")]
+        suffixes = [parse_component(suffix) for suffix in suffixes_input.split(",")]
         
         if not prefixes or not suffixes:
             print("Both prefixes and suffixes are required.")
@@ -260,8 +403,8 @@ class Menu:
         
         for race, components in races.items():
             print(f"\n{race.capitalize()}:")
-            print(f"  Prefixes ({len(components['prefixes'])}): {', '.join(components['prefixes'])}")
-            print(f"  Suffixes ({len(components['suffixes'])}): {', '.join(components['suffixes'])}")
+            print(f"  Prefixes ({len(components['prefixes'])}): {', '.join(map(format_component, components['prefixes']))}")
+            print(f"  Suffixes ({len(components['suffixes'])}): {', '.join(map(format_component, components['suffixes']))}")
 
     ### Title Generator related methods
 
@@ -334,8 +477,9 @@ class Menu:
                     component_type = "origins"
         
         print("\nEnter new components (comma-separated):")
+        print(WEIGHT_HINT)
         components_input = input("> ")
-        new_components = [comp.strip() for comp in components_input.split(",")]
+        new_components = [parse_component(comp) for comp in components_input.split(",")]
         
         if not new_components or all(comp == "" for comp in new_components):
             print("No valid components entered.")
@@ -421,14 +565,63 @@ class Menu:
         print("\nLIST OPTIONS:")
         print("1. List all saved names")
         print("2. Filter by tag")
+        print("3. Search by tags and name")
         
-        list_choice = input("\nChoose list method (1-2): ")
+        list_choice = input("\nChoose list method (1-3): ")
         
         if list_choice == '1':
-            print(generator.list_saved_names())
+            tag = None
         elif list_choice == '2':
             tag = input("Enter tag to filter by: ")
-            print(generator.list_saved_names(tag))
+        elif list_choice == '3':
+            self.search_saved_names(generator)
+            return
+        else:
+            print("Invalid choice.")
+            return
+        
+        print("\nSORT BY:")
+        print("1. Order saved")
+        print("2. Newest first")
+        print("3. Name")
+        
+        sort_choice = input("\nChoose sort order (1-3): ")
+        sort, descending = {"2": ("timestamp", True), "3": ("name", False)}.get(sort_choice, ("saved", False))
+        
+        pages = generator.iter_saved_name_pages(self.page_size, tag, sort, descending)
+        page = next(pages, None)
+        if page is None:
+            print("No saved names found.")
+            return
+        
+        print("Saved Location Names:")
+        while page is not None:
+            print("\n".join(page))
+            page = next(pages, None)
+            if page is not None and input("Press Enter for more (q to stop) ").lower() == 'q':
+                break
+
+
+    def search_saved_names(self, generator):
+        """Search saved names by tags and (approximate) name"""
+        from ttrpg_tools.location_generator import format_saved_name
+        all_tags = [tag.strip() for tag in input("Tags that must all match (comma-separated, blank for any): ").split(',') if tag.strip()]
+        any_tags = [tag.strip() for tag in input("Tags of which at least one must match (comma-separated, blank for any): ").split(',') if tag.strip()]
+        text = input("Name starts with or sounds like (blank for any): ").strip()
+        
+        entries = generator.search_saved_names(all_tags, any_tags, prefix=text or None)
+        if text and not entries:
+            entries = generator.search_saved_names(all_tags, any_tags, fuzzy=text)
+        
+        if not entries:
+            print("No saved names found.")
+            return
+        
+        print("Matching Location Names:")
+        for i, entry in enumerate(entries[:self.page_size], 1):
+            print(format_saved_name(i, entry))
+        if len(entries) > self.page_size:
+            print(f"... and {len(entries) - self.page_size} more. Narrow the search to see them.")
 
 
     def add_location_components(self, generator):
@@ -482,8 +675,9 @@ class Menu:
         
         # Get new components
         print("\nEnter new components (comma-separated):")
+        print(WEIGHT_HINT)
         components_input = input("> ")
-        new_components = [comp.strip() for comp in components_input.split(",")]
+        new_components = [parse_component(comp) for comp in components_input.split(",")]
         
         if not new_components or all(comp == "" for comp in new_components):
             print("No valid components entered.")
@@ -492,8 +686,169 @@ class Menu:
         result = generator.add_location_name_component(component_type, category, new_components)
         print(result)
     
+    ### Encounter Builder related methods
+
+    def build_encounters(self, builder):
+        """Build encounters for the user's party"""
+        from ttrpg_tools.encounter import DIFFICULTIES, parse_party
+        
+        try:
+            levels = parse_party(input("Enter the party's character levels (e.g., 3, 3, 4, 5 or 4x5): "))
+        except ValueError:
+            print("Invalid party. Enter levels separated by commas, e.g., 3, 3, 4, 5 or 4x5.")
+            return
+        
+        print("\nDIFFICULTY:")
+        for number, difficulty in enumerate(DIFFICULTIES, 1):
+            print(f"{number}. {difficulty.capitalize()}")
+        difficulty_choice = input("\nChoose difficulty (1-4): ")
+        difficulty = dict(zip("1234", DIFFICULTIES)).get(difficulty_choice, "medium")
+        
+        terrains = builder.terrain_categories()
+        print("\nTERRAIN TYPES:")
+        for number, terrain in enumerate(terrains, 1):
+            print(f"{number}. {terrain.capitalize()}")
+        print(f"{len(terrains) + 1}. Any")
+        terrain_choice = input(f"\nChoose terrain type (1-{len(terrains) + 1}): ")
+        terrain = dict(zip(map(str, range(1, len(terrains) + 1)), terrains)).get(terrain_choice)
+        
+        count = 1
+        try:
+            count = int(input("\nHow many encounters would you like to build? [1-10]: "))
+            count = max(1, min(10, count))  # Limit between 1 and 10
+        except ValueError:
+            count = 3
+            print(f"Using default count of {count}.")
+        
+        try:
+            encounters = builder.generate_encounters(levels, difficulty, terrain, count)
+        except ValueError as e:
+            print(e)
+            return
+        
+        if not encounters:
+            print(f"No {difficulty} encounter fits that party{f' in {terrain} terrain' if terrain else ''}.")
+            return
+        
+        print(f"\n{difficulty.capitalize()} encounters for a party of levels {', '.join(map(str, levels))}:")
+        for i, encounter in enumerate(encounters):
+            print(f"{i+1}. {encounter}")
+
+
+    def list_monsters(self, builder):
+        """List the monsters by challenge rating"""
+        from ttrpg_tools.encounter import cr_label
+        index = builder.index
+        
+        if not len(index):
+            print("No monsters available.")
+            return
+        
+        print("\nMonsters by Challenge Rating:")
+        print("-----------------------------")
+        for cr in sorted(index.by_cr):
+            names = sorted(index.names[number] for number in index.by_cr[cr])
+            print(f"CR {cr_label(cr)} ({index.xps[index.by_cr[cr][0]]} XP): {', '.join(names)}")
+    
+    ### Loot Generator related methods
+
+    def choose_loot_options(self, generator):
+        """Ask for the party level and terrain; returns (level, terrain) or None"""
+        try:
+            level = int(input(f"Enter the party's level (bands: {', '.join(generator.level_bands())}): "))
+        except ValueError:
+            print("Invalid level. Enter a number such as 5.")
+            return None
+        
+        terrains = generator.terrain_categories()
+        print("\nTERRAIN TYPES:")
+        for number, terrain in enumerate(terrains, 1):
+            print(f"{number}. {terrain.capitalize()}")
+        terrain_choice = input(f"\nChoose terrain type (1-{len(terrains)}): ")
+        terrain = dict(zip(map(str, range(1, len(terrains) + 1)), terrains)).get(terrain_choice)
+        return level, terrain
+
+
+    def roll_hoards(self, generator):
+        """Roll a few treasure hoards"""
+        options = self.choose_loot_options(generator)
+        if options is None:
+            return
+        level, terrain = options
+        
+        count = 1
+        try:
+            count = int(input("\nHow many hoards would you like to roll? [1-10]: "))
+            count = max(1, min(10, count))  # Limit between 1 and 10
+        except ValueError:
+            count = 1
+            print(f"Using default count of {count}.")
+        
+        try:
+            hoards = generator.roll_hoards(terrain, level, count)
+        except ValueError as e:
+            print(e)
+            return
+        
+        print("\nTreasure Hoards:")
+        for i, hoard in enumerate(hoards):
+            print(f"{i+1}. {hoard} (worth {hoard.value:,.0f} gp)")
+
+
+    def roll_dungeon_hoards(self, generator):
+        """Roll every hoard of a dungeon at once and summarize the haul"""
+        options = self.choose_loot_options(generator)
+        if options is None:
+            return
+        level, terrain = options
+        
+        try:
+            count = int(input("\nHow many hoards are in the dungeon? [1-1000]: "))
+            count = max(1, min(1000, count))
+        except ValueError:
+            count = 10
+            print(f"Using default count of {count}.")
+        
+        try:
+            hoards = generator.roll_hoards(terrain, level, count)
+        except ValueError as e:
+            print(e)
+            return
+        
+        for i, hoard in enumerate(hoards):
+            print(f"Hoard {i+1}: {hoard}")
+        total = sum(hoard.value for hoard in hoards)
+        magic_items = sum(count for hoard in hoards for count, value in hoard.items.values() if not value)
+        print(f"\n{count} hoards worth {total:,.0f} gp in total, with {magic_items} other items.")
+
+
+    def roll_loot_table(self, generator):
+        """Roll on one named loot table"""
+        table_names = generator.get_table_names()
+        if not table_names:
+            print("No loot tables available.")
+            return
+        
+        print("\nLoot tables: " + ", ".join(table_names))
+        name = input("Enter the table to roll on: ").strip()
+        
+        try:
+            count = int(input("How many rolls? [1-20]: "))
+            count = max(1, min(20, count))
+        except ValueError:
+            count = 1
+            print(f"Using default count of {count}.")
+        
+        print(generator.roll_on_table(name, count))
+    
 ### General methods
 
 def clear_term() -> None:
     """Clear the terminal screen"""
-    os.system(CLEAR)
\ No newline at end of file
+    if not sys.stdout.isatty():
+        return
+    if sys.platform == 'win32':
+        os.system(CLEAR)
+    else:
+        sys.stdout.write(CLEAR)
+        sys.stdout.flush()
\ No newline at end of file
@@ -1,34 +1,79 @@
-import random
-import json
 import os
 
+from ttrpg_tools.export import export
+from ttrpg_tools.instrument import timed
+from ttrpg_tools.markov import DEFAULT_ORDER, MarkovSampler, models_from_dict, models_to_dict, source_hash, train_models
+from ttrpg_tools.permutation import distinct, iter_unique_combinations, unique_capacity
+from ttrpg_tools.registry import registry
+from ttrpg_tools.rng import make_rng
+from ttrpg_tools.storage import DeferredSaves, save_data
+from ttrpg_tools.tables import SamplingTable
 
-class NameGenerator:
-    def __init__(self, data_file="data/fantasy_names.json"):
+
+class RaceTable:
+    """Compiled prefix and suffix tables for one race"""
+    __slots__ = ("prefixes", "suffixes")
+
+    def __init__(self, prefixes, suffixes):
+        self.prefixes = SamplingTable(prefixes)
+        self.suffixes = SamplingTable(suffixes)
+
+
+def compile_race_tables(races):
+    """Compile race data into {race: RaceTable}"""
+    return {race: RaceTable(parts["prefixes"], parts["suffixes"]) for race, parts in races.items()}
+
+
+@timed("names.draw_names")
+def draw_names(table, rng, count):
+    """Draw count names from a RaceTable, drawing each part in one batch"""
+    return list(map(str.__add__, table.prefixes.draw_many(rng, count), table.suffixes.draw_many(rng, count)))
+
+
+class NameGenerator(DeferredSaves):
+    chunk_size = 10000
+    markov_order = DEFAULT_ORDER
+
+    def __init__(self, data_file="data/fantasy_names.json", rng=None):
         self.data_file = data_file
+        self.model_file = os.path.splitext(data_file)[0] + ".markov.json"
+        self.rng = make_rng(rng)
         self.races = {}
+        self.tables = {}
+        self.markov_models = None  # trained or loaded on first use
+        self.markov_samplers = {}
         self.load_races()
 
     
+    @timed("names.load_races")
     def load_races(self):
         """Load race data from the JSON file"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as file:
-                    self.races = json.load(file)
-                print(f"Successfully loaded {len(self.races)} races from {self.data_file}")
+            races, loaded = registry.load(self.data_file)
+            if races is not None:
+                self.races = races
+                self.tables = registry.derived(self.data_file, "race_tables", compile_race_tables)
+                if loaded:
+                    print(f"Successfully loaded {len(self.races)} races from {self.data_file}")
                 
             else:
                 print(f"Data file {self.data_file} not found. Creating with default races.")
                 self.create_default_races()
+                self.compile_tables()
                 self.save_races()
                 
         except Exception as e:
             print(f"Error loading races: {e}")
             print("Creating default races instead.")
             self.create_default_races()
+            self.compile_tables()
             self.save_races()
 
+
+    def compile_tables(self):
+        """Rebuild the sampling tables after the race data changed"""
+        self.tables = compile_race_tables(self.races)
+
     
     def create_default_races(self):
         """Create default races if no file exists"""
@@ -52,34 +97,158 @@ class NameGenerator:
         }
 
     
+    @timed("names.save_races")
     def save_races(self):
         """Save the current races to the JSON file"""
+        if self.defer_save(self.save_races):
+            return
+        
         try:
-            with open(self.data_file, 'w') as file:
-                json.dump(self.races, file, indent=2)
+            save_data(self.races, self.data_file)
+            registry.store(self.data_file, self.races)
             print(f"Successfully saved races to {self.data_file}")
             
         except Exception as e:
             print(f"Error saving races: {e}")
 
     
+    def get_race_table(self, race):
+        """Return the compiled table for a race (case-insensitive), or None"""
+        table = self.tables.get(race)
+        if table is None:
+            table = self.tables.get(race.lower())
+        return table
+
+
+    def unknown_race_message(self, race):
+        """Message returned when a race is not recognized"""
+        return f"Sorry, '{race.lower()}' is not a recognized race. Available races: {', '.join(self.races.keys())}"
+
+
+    @timed("names.generate_name")
     def generate_name(self, race):
         """Generate a random name for the specified race"""
-        race = race.lower()
-        if race not in self.races:
-            return f"Sorry, '{race}' is not a recognized race. Available races: {', '.join(self.races.keys())}"
-        name_parts = self.races[race]
-        prefix = random.choice(name_parts["prefixes"])
-        suffix = random.choice(name_parts["suffixes"])
-        return f"{prefix}{suffix}"
+        table = self.get_race_table(race)
+        if table is None:
+            return self.unknown_race_message(race)
+        return table.prefixes.draw(self.rng) + table.suffixes.draw(self.rng)
 
     
+    @timed("names.generate_multiple_names")
     def generate_multiple_names(self, race, count=5):
         """Generate multiple names for the specified race"""
-        names = []
-        for _ in range(count):
-            names.append(self.generate_name(race))
-        return names
+        if self.get_race_table(race) is None:
+            return [self.unknown_race_message(race)] * count
+        return list(self.iter_names(race, count))
+
+
+    def iter_name_chunks(self, race, count, chunk_size=None):
+        """Lazily yield lists of names, drawing each chunk's components in one batch"""
+        table = self.get_race_table(race)
+        if table is None:
+            raise ValueError(self.unknown_race_message(race))
+        chunk_size = chunk_size or self.chunk_size
+        for start in range(0, count, chunk_size):
+            yield draw_names(table, self.rng, min(chunk_size, count - start))
+
+
+    def iter_names(self, race, count, chunk_size=None):
+        """Lazily yield count names for the race"""
+        for chunk in self.iter_name_chunks(race, count, chunk_size):
+            yield from chunk
+
+
+    @timed("names.write_names")
+    def write_names(self, race, count, file, chunk_size=None, fmt="text"):
+        """Stream count names to an open text file in an export format (see ttrpg_tools.export), in constant memory"""
+        return export(self.iter_name_chunks(race, count, chunk_size), file, fmt, "name", die=count)
+
+    
+    def unique_name_parts(self, race):
+        """Distinct prefixes and suffixes used for unique generation"""
+        table = self.get_race_table(race)
+        if table is None:
+            raise ValueError(self.unknown_race_message(race))
+        return (distinct(table.prefixes.items), distinct(table.suffixes.items))
+
+
+    def unique_name_capacity(self, race):
+        """How many (prefix, suffix) combinations the race has (at most this many unique names)"""
+        return unique_capacity(self.unique_name_parts(race))
+
+
+    def iter_unique_names(self, race, count=None):
+        """Iterator over names that never repeat.
+
+        Raises ValueError right away for an unknown race, a negative count or
+        a count above unique_name_capacity(race); count=None yields every
+        combination.
+        """
+        return iter_unique_combinations(self.unique_name_parts(race), self.rng, count, "".join, dedupe=True)
+
+    
+    @timed("names.load_markov_models")
+    def load_markov_models(self):
+        """Load the precompiled Markov name models, retraining them if the race data changed"""
+        source = source_hash(self.races, self.markov_order)
+        try:
+            data, _ = registry.load(self.model_file)
+        except Exception as e:
+            print(f"Error loading name models: {e}")
+            data = None
+
+        if data is not None and data.get("source") == source:
+            self.markov_models = registry.derived(self.model_file, "markov_models", models_from_dict)
+        else:
+            self.markov_models = train_models(self.races, self.markov_order)
+            try:
+                data = models_to_dict(self.markov_models, source)
+                save_data(data, self.model_file)
+                registry.store(self.model_file, data)
+            except Exception as e:
+                print(f"Error saving name models: {e}")
+        self.markov_samplers = {}
+
+
+    def get_markov_sampler(self, race):
+        """Return the Markov name sampler for a race (case-insensitive), or None"""
+        if self.markov_models is None:
+            self.load_markov_models()
+        race = race if race in self.markov_models else race.lower()
+        sampler = self.markov_samplers.get(race)
+        if sampler is None and race in self.markov_models:
+            sampler = self.markov_samplers[race] = MarkovSampler(self.markov_models[race], self.rng)
+        return sampler
+
+
+    @timed("names.generate_markov_name")
+    def generate_markov_name(self, race):
+        """Generate a new name in the style of the race from its Markov model"""
+        sampler = self.get_markov_sampler(race)
+        if sampler is None:
+            return self.unknown_race_message(race)
+        return sampler.generate()
+
+
+    @timed("names.generate_multiple_markov_names")
+    def generate_multiple_markov_names(self, race, count=5):
+        """Generate multiple Markov model names for the race"""
+        sampler = self.get_markov_sampler(race)
+        if sampler is None:
+            return [self.unknown_race_message(race)] * count
+        return sampler.generate_many(count)
+
+
+    def import_names(self, race, names):
+        """Add whole names to a race's Markov training data"""
+        race = race.lower()
+        if race not in self.races:
+            return f"Race '{race}' not found"
+        names = [name.strip() for name in names if name.strip()]
+        self.races[race].setdefault("names", []).extend(names)
+        self.markov_models = None
+        self.save_races()
+        return f"Imported {len(names)} names for {race}"
 
     
     def get_available_races(self):
@@ -94,6 +263,8 @@ class NameGenerator:
             "prefixes": prefixes,
             "suffixes": suffixes
         }
+        self.tables[race] = RaceTable(prefixes, suffixes)
+        self.markov_models = None
         self.save_races()
         return f"Added race: {race}"
 
@@ -103,6 +274,8 @@ class NameGenerator:
         race = race.lower()
         if race in self.races:
             del self.races[race]
+            del self.tables[race]
+            self.markov_models = None
             self.save_races()
             return f"Deleted race: {race}"
         return f"Race '{race}' not found"
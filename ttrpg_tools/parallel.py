@@ -0,0 +1,80 @@
+"""Generate very large batches on several processes.
+
+A batch of count results is split into shards of shard_size. Each worker
+process receives the compiled tables once, through the pool initializer,
+and each shard draws from its own SeedStream child (keyed by shard number),
+so the output depends only on the seed and the shard size, never on how
+many workers ran it or which worker got which shard. With one worker the
+same shards are drawn in this process. Shards are returned in order.
+
+Draw functions take (table, rng, count) and return a list; they must be
+module-level functions (or functools.partial objects wrapping them) so they
+can be sent to the workers.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from ttrpg_tools.rng import SeedStream
+
+
+SHARD_SIZE = 50000
+
+_worker_draw = None
+_worker_table = None
+_worker_seeds = None
+
+
+def _init_worker(draw, table, seeds):
+    global _worker_draw, _worker_table, _worker_seeds
+    _worker_draw, _worker_table, _worker_seeds = draw, table, seeds
+
+
+def _run_shard(index, size):
+    return _worker_draw(_worker_table, _worker_seeds.child(index).random(), size)
+
+
+def roll_totals(expression, rng, count):
+    """Draw function for dice totals"""
+    from ttrpg_tools import dice
+    return dice.roll_many(expression, count, rng).tolist()
+
+
+def default_workers():
+    """Number of CPUs this process may use"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def iter_shards(draw, table, count, seeds=None, workers=None, shard_size=SHARD_SIZE):
+    """Lazily yield the shards (lists of results) of a batch of count results, in order.
+
+    At most two shards per worker are in flight at once, so memory stays
+    bounded however large count is.
+    """
+    if isinstance(seeds, int) or seeds is None:
+        seeds = SeedStream(seeds)
+    workers = workers or default_workers()
+    sizes = ((index, min(shard_size, count - start)) for index, start in enumerate(range(0, count, shard_size)))
+    if workers == 1:
+        for index, size in sizes:
+            yield draw(table, seeds.child(index).random(), size)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(draw, table, seeds)) as executor:
+        pending = deque()
+        for index, size in sizes:
+            pending.append(executor.submit(_run_shard, index, size))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate(draw, table, count, seeds=None, workers=None, shard_size=SHARD_SIZE):
+    """Return a list of count results generated in parallel"""
+    results = []
+    for shard in iter_shards(draw, table, count, seeds, workers, shard_size):
+        results.extend(shard)
+    return results
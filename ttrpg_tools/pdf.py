@@ -0,0 +1,281 @@
+"""Pure-Python PDF writer for printable random tables.
+
+Pages are written to the output as soon as they are full, so only the page
+being laid out is held in memory; a 500-page compendium costs the same
+memory as a single page. Text uses the built-in Helvetica fonts, so no font
+files (or third-party packages) are needed.
+
+    with TablePDF(open("tables.pdf", "wb"), title="Names") as pdf:
+        pdf.add_table("Elf names", generator.generate_multiple_names("elf", 100))
+"""
+import zlib
+
+from ttrpg_tools.export import roll_labels
+
+
+PAGE_SIZES = {"letter": (612, 792), "a4": (595, 842)}
+
+# Advance widths of Helvetica in 1/1000 em for ASCII 32..126 (from the standard AFM)
+_HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+WIDTHS = {chr(32 + i): width for i, width in enumerate(_HELVETICA_WIDTHS)}
+
+
+def text_width(text, size):
+    """Width of text in points when set in Helvetica at size"""
+    return sum(WIDTHS.get(char, 556) for char in text) * size / 1000
+
+
+def wrap_text(text, width, size):
+    """Split text into lines no wider than width, breaking at spaces where possible"""
+    lines = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if text_width(candidate, size) <= width:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+        while text_width(word, size) > width and len(word) > 1:
+            cut = len(word) - 1
+            while cut > 1 and text_width(word[:cut], size) > width:
+                cut -= 1
+            lines.append(word[:cut])
+            word = word[cut:]
+        line = word
+    lines.append(line)
+    return lines
+
+
+def pdf_string(text):
+    """Encode text as a PDF literal string in WinAnsi (Latin-1) encoding"""
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return b"(" + escaped.encode("latin-1", "replace") + b")"
+
+
+class PDFWriter:
+    """Low-level PDF file that writes each object as soon as it is added.
+
+    Object 1 is the catalog and object 2 the page tree; both are written by
+    close() together with the cross-reference table, once every page is known.
+    Only byte offsets and page object numbers are kept in memory.
+    """
+
+    def __init__(self, file, title=None, compress=True):
+        self.file = file
+        self.compress = compress
+        self.position = 0
+        self.offsets = [0, 0, 0]  # object 0 is the free-list head; 1 and 2 are written last
+        self.pages = []
+        self.title = title
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.fonts = {
+            "F1": self.add_object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"),
+            "F2": self.add_object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"),
+        }
+
+    def _write(self, data):
+        self.file.write(data)
+        self.position += len(data)
+
+    def _write_object(self, number, body):
+        self.offsets[number] = self.position
+        self._write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    def add_object(self, body):
+        """Write an object and return its number"""
+        self.offsets.append(0)
+        number = len(self.offsets) - 1
+        self._write_object(number, body)
+        return number
+
+    def add_stream(self, data):
+        """Write a (compressed) stream object and return its number"""
+        if self.compress:
+            data = zlib.compress(data, 6)
+            head = b"<< /Length %d /Filter /FlateDecode >>" % len(data)
+        else:
+            head = b"<< /Length %d >>" % len(data)
+        return self.add_object(head + b"\nstream\n" + data + b"\nendstream")
+
+    def add_page(self, content, width, height):
+        """Write one page with the given content stream"""
+        contents = self.add_stream(content)
+        fonts = b" ".join(b"/%s %d 0 R" % (name.encode(), number) for name, number in self.fonts.items())
+        self.pages.append(self.add_object(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R /Resources << /Font << %s >> >> >>"
+            % (width, height, contents, fonts)
+        ))
+
+    def close(self):
+        """Write the page tree, catalog, document info and cross-reference table"""
+        kids = b" ".join(b"%d 0 R" % number for number in self.pages)
+        self._write_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages)))
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        info = b"<< /Producer (Alex's Personal TTRPG Tools)"
+        if self.title:
+            info += b" /Title " + pdf_string(self.title)
+        info = self.add_object(info + b" >>")
+
+        xref = self.position
+        lines = [b"xref\n0 %d\n" % len(self.offsets), b"0000000000 65535 f \n"]
+        lines.extend(b"%010d 00000 n \n" % offset for offset in self.offsets[1:])
+        self._write(b"".join(lines))
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self.offsets), info, xref))
+
+
+class TablePDF:
+    """Lays out numbered random tables in columns and streams the pages to a PDF.
+
+    Tables flow down each column and on to the next; a table that does not
+    fit starts a new column, and one that runs over continues in the next
+    column under a '(continued)' heading.
+    """
+    margin = 48
+    columns = 2
+    gutter = 24
+    font_size = 10
+    leading = 12.5
+    heading_size = 12
+    label_width = 34
+
+    def __init__(self, file, title=None, page_size="letter", compress=True):
+        self.writer = PDFWriter(file, title, compress)
+        self.width, self.height = PAGE_SIZES[page_size]
+        self.column_width = (self.width - 2 * self.margin - (self.columns - 1) * self.gutter) / self.columns
+        self.top = self.height - self.margin
+        self.bottom = self.margin + 2 * self.leading  # room for the page number
+        self.title = title
+        self.ops = None
+        self.column = 0
+        self.column_top = self.y = self.top
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    @property
+    def page_count(self):
+        return len(self.writer.pages) + (self.ops is not None)
+
+    def _start_page(self):
+        self.ops = []
+        self.column = 0
+        self.column_top = self.top
+        if self.title and not self.writer.pages:
+            self._text(self.margin, self.top - 18, self.title, "F2", 18)
+            self.column_top -= 36
+        self.y = self.column_top
+
+    def _finish_page(self):
+        number = str(len(self.writer.pages) + 1)
+        self._text((self.width - text_width(number, 9)) / 2, self.margin, number, "F1", 9)
+        self.writer.add_page(b"\n".join(self.ops), self.width, self.height)
+        self.ops = None
+
+    def _next_column(self):
+        self.column += 1
+        self.y = self.column_top
+        if self.column >= self.columns:
+            self._finish_page()
+            self._start_page()
+
+    def _fits(self, height):
+        if self.ops is None:
+            self._start_page()
+        return self.y - height >= self.bottom
+
+    def _x(self):
+        return self.margin + self.column * (self.column_width + self.gutter)
+
+    def _text(self, x, y, text, font, size):
+        self.ops.append(b"BT /%s %g Tf %.2f %.2f Td %s Tj ET" % (font.encode(), size, x, y, pdf_string(text)))
+
+    def _heading(self, title):
+        x = self._x()
+        self.y -= self.heading_size + 2
+        self._text(x, self.y, title, "F2", self.heading_size)
+        self.y -= 4
+        self.ops.append(b"0.5 w %.2f %.2f m %.2f %.2f l S" % (x, self.y, x + self.column_width, self.y))
+        self.y -= 2
+
+    def add_table(self, title, rows, die=None):
+        """Add a numbered table of rows; die defaults to the number of rows"""
+        rows = list(rows)
+        die = die or len(rows)
+        heading_height = self.heading_size + 8
+        if not self._fits(heading_height + self.leading * min(3, len(rows))):
+            self._next_column()
+        self._heading(f"{title} (d{die})")
+
+        text_width_available = self.column_width - self.label_width - 6
+        for index, (label, row) in enumerate(zip(roll_labels(die), rows)):
+            lines = wrap_text(str(row), text_width_available, self.font_size)
+            height = self.leading * len(lines)
+            if not self._fits(height):
+                self._next_column()
+                self._heading(f"{title} (continued)")
+            x = self._x()
+            if index % 2:
+                self.ops.append(b"0.92 g %.2f %.2f %.2f %.2f re f 0 g" % (x, self.y - height, self.column_width, height))
+            baseline = self.y - self.leading + 3
+            self._text(x + self.label_width - 6 - text_width(label, self.font_size), baseline, label, "F2", self.font_size)
+            for line in lines:
+                self._text(x + self.label_width, baseline, line, "F1", self.font_size)
+                baseline -= self.leading
+            self.y -= height
+        self.y -= self.leading
+
+    def new_page(self):
+        """Start the next table on a new page"""
+        if self.ops is not None:
+            self._finish_page()
+
+    def close(self):
+        """Finish the last page and the document"""
+        if self.ops is not None:
+            self._finish_page()
+        self.writer.close()
+
+
+def write_tables_pdf(tables, path, title=None, page_size="letter"):
+    """Write (title, rows) tables to a PDF file, returning the number of pages"""
+    with open(path, 'wb') as file:
+        pdf = TablePDF(file, title, page_size)
+        for table_title, rows in tables:
+            pdf.add_table(table_title, rows)
+        pdf.close()
+    return len(pdf.writer.pages)
+
+
+def iter_compendium_tables(name_generator=None, title_generator=None, location_generator=None, die=100, loot_generator=None):
+    """Endlessly yield (title, rows) tables of die rows, cycling through every race, title kind, terrain and hoard table"""
+    kinds = []
+    if name_generator is not None:
+        kinds.extend((f"{race.capitalize()} names", lambda race=race: name_generator.generate_multiple_names(race, die))
+                     for race in name_generator.get_available_races())
+    if title_generator is not None:
+        kinds.extend((f"{complexity.capitalize()} {sentiment} titles",
+                      lambda complexity=complexity, sentiment=sentiment: title_generator.generate_multiple_titles(complexity, sentiment, die))
+                     for complexity, sentiment in title_generator.tables)
+    if location_generator is not None:
+        kinds.extend((f"{terrain.capitalize()} locations", lambda terrain=terrain: location_generator.generate_multiple_location_names(terrain, die))
+                     for terrain in location_generator.tables.terrain_categories)
+    if loot_generator is not None and loot_generator.tables is not None:
+        kinds.extend((f"{terrain.capitalize()} hoards, levels {low}-{high}",
+                      lambda terrain=terrain, low=low: list(map(str, loot_generator.roll_hoards(terrain, low, die))))
+                     for terrain, by_band in loot_generator.tables.hoards.items() for low, high in by_band)
+    if not kinds:
+        return
+    while True:
+        for title, generate in kinds:
+            yield title, generate()
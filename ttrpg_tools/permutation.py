@@ -0,0 +1,115 @@
+from itertools import islice
+from math import prod
+
+
+_MASK64 = (1 << 64) - 1
+
+
+class IndexPermutation:
+    """Seeded pseudo-random bijection over range(size).
+
+    A balanced Feistel network permutes the smallest even-bit domain that
+    covers size; values that land outside range(size) are re-encrypted
+    (cycle walking). Each lookup is O(1) on average and needs no memory of
+    previously returned values.
+    """
+    __slots__ = ("size", "half_bits", "mask", "keys")
+
+    def __init__(self, size, key, rounds=4):
+        if size < 1:
+            raise ValueError("Permutation size must be at least 1.")
+        self.size = size
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.mask = (1 << self.half_bits) - 1
+        self.keys = tuple(_mix(key + round_number) for round_number in range(rounds))
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError("permutation index out of range")
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield self[index]
+
+    def _encrypt(self, value):
+        half_bits, mask = self.half_bits, self.mask
+        left, right = value >> half_bits, value & mask
+        for key in self.keys:
+            left, right = right, left ^ (_mix(right ^ key) & mask)
+        return (left << half_bits) | right
+
+
+def _mix(value):
+    """splitmix64 finalizer used as the Feistel round function"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def unique_capacity(parts):
+    """Number of combinations that take one item from each part (an upper bound on distinct items)"""
+    return prod(len(part) for part in parts)
+
+
+def iter_unique_combinations(parts, rng, count=None, render=tuple, dedupe=False):
+    """Iterator over count distinct renderings of combinations (one item per part), in a seeded random order.
+
+    parts is a sequence of tuples and render turns a combination (a list)
+    into the generated item. This is a plain function, so a negative count
+    or more combinations than exist raises ValueError when it is called
+    rather than on the first next(). Distinct combinations are assumed to
+    render to distinct items, so nothing is remembered between items; pass
+    dedupe=True when they can collide (e.g. "Ar" + "wen" and "Arw" + "en")
+    to skip repeats, at the cost of a set of the items produced. Should
+    that leave fewer than count items, ValueError is raised once the
+    combinations run out.
+    """
+    capacity = unique_capacity(parts)
+    if count is None:
+        count = capacity
+    if count < 0:
+        raise ValueError("Count cannot be negative.")
+    if count > capacity:
+        raise ValueError(f"Only {capacity} unique combinations are available, {count} were requested.")
+    if not count:
+        return iter(())
+    combinations = _iter_combinations(parts, IndexPermutation(capacity, rng.getrandbits(64)), render)
+    if dedupe:
+        return _iter_distinct(combinations, count)
+    return islice(combinations, count)
+
+
+def _iter_combinations(parts, permutation, render):
+    radices = [len(part) for part in parts]
+    for position in range(len(permutation)):
+        index = permutation[position]
+        combination = []
+        for part, radix in zip(parts, radices):
+            index, digit = divmod(index, radix)
+            combination.append(part[digit])
+        yield render(combination)
+
+
+def _iter_distinct(items, count):
+    seen = set()
+    for item in items:
+        if item in seen:
+            continue
+        seen.add(item)
+        yield item
+        if len(seen) == count:
+            return
+    raise ValueError(f"Only {len(seen)} unique combinations are available, {count} were requested.")
+
+
+def distinct(items):
+    """Items with duplicates removed, keeping the first occurrence"""
+    return tuple(dict.fromkeys(items))
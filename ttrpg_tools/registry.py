@@ -0,0 +1,90 @@
+import os
+import threading
+
+from ttrpg_tools.instrument import count
+from ttrpg_tools.storage import load_data
+
+
+class _Entry:
+    """A cached data file together with anything derived from it"""
+    __slots__ = ("stamp", "data", "derived")
+
+    def __init__(self, stamp, data):
+        self.stamp = stamp
+        self.data = data
+        self.derived = {}
+
+
+class DataRegistry:
+    """Process-wide cache of parsed data files.
+
+    Each file is read and parsed once and then served from memory until its
+    modification time or size changes on disk. Structures built from the data
+    (see derived) are cached alongside it and dropped when the file reloads.
+    """
+
+    def __init__(self, loader=load_data):
+        self.loader = loader
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _stamp(path):
+        """Return (mtime_ns, size) for path, or None if it does not exist"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self, path):
+        """Return (data, loaded) for path; loaded is True if it was read from disk.
+
+        Returns (None, False) if the file does not exist.
+        """
+        key = os.path.abspath(path)
+        stamp = self._stamp(key)
+        with self._lock:
+            if stamp is None:
+                self._entries.pop(key, None)
+                return None, False
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp == stamp:
+                count("registry.hits")
+                return entry.data, False
+            count("registry.misses")
+            data = self.loader(key)
+            self._entries[key] = _Entry(stamp, data)
+            return data, True
+
+    def store(self, path, data):
+        """Record data that was just written to path so it is not reloaded"""
+        key = os.path.abspath(path)
+        stamp = self._stamp(key)
+        with self._lock:
+            if stamp is None:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = _Entry(stamp, data)
+
+    def derived(self, path, name, build):
+        """Return build(data) for a loaded file, cached until the file changes"""
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                raise KeyError(f"{path} has not been loaded")
+            if name not in entry.derived:
+                entry.derived[name] = build(entry.data)
+            return entry.derived[name]
+
+    def invalidate(self, path=None):
+        """Forget one cached file, or every file if path is None"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+
+registry = DataRegistry()
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import random
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def numpy_module():
+    """Import NumPy on first use, returning None when it is not installed"""
+    try:
+        import numpy
+    except ImportError:  # NumPy is optional; batch operations fall back to the stdlib
+        return None
+    return numpy
+
+
+class SeedStream:
+    """A node in a deterministic tree of seeds, similar to NumPy's SeedSequence.
+
+    The same root seed always produces the same children, so work can be split
+    into shards (or worker processes) that each get an independent stream and
+    still reproduce byte-identical output.
+    """
+    __slots__ = ("seed", "path", "_spawned")
+
+    def __init__(self, seed=None, path=()):
+        self.seed = int.from_bytes(os.urandom(16), "big") if seed is None else int(seed)
+        self.path = tuple(path)
+        self._spawned = 0
+
+    @property
+    def entropy(self):
+        """128-bit integer derived from the root seed and this node's path"""
+        key = f"{self.seed}:{'/'.join(map(str, self.path))}".encode()
+        return int.from_bytes(hashlib.sha256(key).digest()[:16], "big")
+
+    def child(self, key):
+        """Return the child stream with a fixed key (e.g. a shard number)"""
+        return SeedStream(self.seed, self.path + (key,))
+
+    def spawn(self, n):
+        """Return the next n child streams of this node"""
+        children = [self.child(self._spawned + i) for i in range(n)]
+        self._spawned += n
+        return children
+
+    def random(self):
+        """Return a random.Random seeded from this stream"""
+        return random.Random(self.entropy)
+
+    def numpy(self):
+        """Return a NumPy Generator seeded from this stream (requires NumPy)"""
+        import numpy as np
+        return np.random.default_rng(self.entropy)
+
+    def __getstate__(self):
+        return (self.seed, self.path, self._spawned)
+
+    def __setstate__(self, state):
+        self.seed, self.path, self._spawned = state
+
+    def __repr__(self):
+        return f"SeedStream(seed={self.seed}, path={self.path})"
+
+
+def make_rng(rng=None):
+    """Return a random.Random-like source for None, a seed, a SeedStream or an existing source"""
+    if rng is None:
+        return random.Random()
+    if isinstance(rng, SeedStream):
+        return rng.random()
+    if isinstance(rng, int):
+        return SeedStream(rng).random()
+    return rng
+
+
+def make_numpy_rng(rng=None):
+    """Return a NumPy Generator for None, a seed, a SeedStream, a Generator or a random.Random"""
+    import numpy as np
+    if rng is None:
+        return np.random.default_rng()
+    if isinstance(rng, SeedStream):
+        return rng.numpy()
+    if isinstance(rng, int):
+        return SeedStream(rng).numpy()
+    if hasattr(rng, "integers"):
+        return rng
+    return np.random.default_rng(rng.getrandbits(64))
@@ -0,0 +1,124 @@
+import re
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+
+_WORDS = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """Lower-cased words of a name"""
+    return _WORDS.findall(text.lower())
+
+
+def trigrams(word):
+    """Character trigrams of a word, padded so short words still have some"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SavedNameIndex:
+    """In-memory inverted index over saved names.
+
+    Keeps tag -> entry ids, name token -> entry ids and trigram -> tokens
+    maps that are updated one entry at a time by add, so queries never scan
+    the whole history.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self.tags = defaultdict(set)
+        self.tokens = defaultdict(set)
+        self.trigrams = defaultdict(set)
+        self.vocabulary = []  # sorted tokens, for prefix search
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry):
+        """Index one entry and return its id"""
+        entry_id = len(self.entries)
+        self.entries.append(entry)
+        for tag in entry.get("tags", []):
+            self.tags[tag].add(entry_id)
+        for token in tokenize(entry["name"]):
+            if token not in self.tokens:
+                insort(self.vocabulary, token)
+                for trigram in trigrams(token):
+                    self.trigrams[trigram].add(token)
+            self.tokens[token].add(entry_id)
+        return entry_id
+
+    def with_prefix(self, prefix):
+        """Ids of entries with a name word starting with prefix"""
+        prefix = prefix.lower()
+        ids = set()
+        position = bisect_left(self.vocabulary, prefix)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(prefix):
+            ids |= self.tokens[self.vocabulary[position]]
+            position += 1
+        return ids
+
+    def similar_tokens(self, word, threshold=0.75):
+        """Indexed tokens similar to word.
+
+        Tokens sharing trigrams with the word are the only candidates; they
+        are then scored with difflib's ratio, which tolerates typos and swapped
+        letters that break most trigrams of short words.
+        """
+        word = word.lower()
+        shared = Counter()
+        for trigram in trigrams(word):
+            for token in self.trigrams.get(trigram, ()):
+                shared[token] += 1
+        needed = 1 if len(word) <= 5 else 2
+        matcher = SequenceMatcher(b=word)
+        matches = []
+        for token, common in shared.items():
+            if common < needed or abs(len(token) - len(word)) > 2:
+                continue
+            matcher.set_seq1(token)
+            if matcher.ratio() >= threshold:
+                matches.append(token)
+        return matches
+
+    def fuzzy(self, text, threshold=0.75):
+        """Ids of entries whose name has a word close to every word of text"""
+        ids = None
+        for word in tokenize(text):
+            matches = set()
+            for token in self.similar_tokens(word, threshold):
+                matches |= self.tokens[token]
+            ids = matches if ids is None else ids & matches
+        return ids or set()
+
+    def search(self, all_tags=(), any_tags=(), prefix=None, fuzzy=None, limit=None):
+        """Entries matching every given condition, in the order they were saved.
+
+        all_tags: entries must carry each of these tags (AND)
+        any_tags: entries must carry at least one of these tags (OR)
+        prefix: a word of the name starts with this text
+        fuzzy: every word of this text approximately matches a word of the name
+        """
+        candidates = []
+        if all_tags:
+            candidates.extend(self.tags.get(tag, set()) for tag in all_tags)
+        if any_tags:
+            candidates.append(set().union(*(self.tags.get(tag, set()) for tag in any_tags)))
+        if prefix:
+            candidates.append(self.with_prefix(prefix))
+        if fuzzy:
+            candidates.append(self.fuzzy(fuzzy))
+
+        if candidates:
+            candidates.sort(key=len)
+            ids = set(candidates[0]).intersection(*candidates[1:])
+            ordered = sorted(ids)
+        else:
+            ordered = range(len(self.entries))
+        if limit is not None:
+            ordered = ordered[:limit]
+        return [self.entries[entry_id] for entry_id in ordered]
@@ -0,0 +1,318 @@
+"""Locally hosted JSON API for the generators, built on asyncio.
+
+Every generator is loaded once when the server starts and shared by all
+connections. Connections are kept alive between requests (HTTP/1.1), and
+every endpoint takes a count so a whole table's worth of results comes back
+in one response. Handlers run on a worker thread, one request at a time, so
+a large batch never stalls the event loop that reads other requests.
+
+Endpoints (GET, query string parameters):
+    /roll?expression=4d6dl1&count=6&detail=1
+    /odds?expression=2d20kh1+7&dc=15&dc=20
+    /names?race=elf&count=10&unique=1
+    /titles?complexity=complex&sentiment=negative&count=5
+    /locations?terrain=water&count=5
+    /races
+    /terrains
+
+Example:
+    python -m ttrpg_tools serve --port 8000
+    curl 'http://127.0.0.1:8000/roll?expression=1d20+5&count=4'
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import unquote, urlsplit
+
+from ttrpg_tools.rng import SeedStream
+
+
+MAX_COUNT = 10000
+MAX_ODDS_COST = 3 * 10**7  # dice.distribution_cost limit for /odds (about a tenth of a second)
+MAX_DETAIL_DICE = 100000  # dice rolled (count x dice per roll) for /roll?detail=1
+MAX_HEADER_LINES = 100
+IDLE_TIMEOUT = 15.0
+
+
+class HTTPError(Exception):
+    """An error response with a status code"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_query(query):
+    """Parse a query string into {name: [values]}.
+
+    Unlike urllib's parse_qs a '+' is kept as-is, so dice expressions such
+    as 1d20+5 can be typed straight into the URL.
+    """
+    params = {}
+    for pair in query.split("&"):
+        if not pair:
+            continue
+        name, _, value = pair.partition("=")
+        params.setdefault(unquote(name), []).append(unquote(value))
+    return params
+
+
+class Request:
+    """One parsed request: method, path and query parameters"""
+
+    def __init__(self, method, target, version, headers):
+        self.method = method
+        self.version = version
+        self.headers = headers
+        parts = urlsplit(target)
+        self.path = parts.path.rstrip("/") or "/"
+        self.params = parse_query(parts.query)
+
+    def get(self, name, default=None):
+        """Last value of a query parameter, or default"""
+        values = self.params.get(name)
+        return values[-1] if values else default
+
+    def flag(self, name):
+        """True if a query parameter is set to 1/true/yes"""
+        return str(self.get(name, "")).lower() in ("1", "true", "yes")
+
+    def count(self):
+        """The count parameter, checked against MAX_COUNT"""
+        try:
+            count = int(self.get("count", 1))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "count must be a whole number.") from None
+        if not 1 <= count <= MAX_COUNT:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"count must be between 1 and {MAX_COUNT}.")
+        return count
+
+    def require(self, name):
+        """A parameter that must be present"""
+        value = self.get(name)
+        if not value:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Missing '{name}' parameter.")
+        return value
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+class GeneratorServer:
+    """Serves the generators over HTTP, sharing one loaded copy of each"""
+
+    def __init__(self, data_dir="data", seed=None):
+        from ttrpg_tools import dice
+        from ttrpg_tools.location_generator import LOCATION_DATA_NAME, LocationNameGenerator
+        from ttrpg_tools.name_generator import NameGenerator
+        from ttrpg_tools.title_generator import TitleGenerator
+
+        seeds = SeedStream(seed)
+        self.dice = dice
+        self.dice_rng = seeds.spawn(1)[0].random()
+        self.name_generator = NameGenerator(os.path.join(data_dir, "fantasy_names.json"), rng=seeds.spawn(1)[0])
+        self.title_generator = TitleGenerator(os.path.join(data_dir, "fantasy_titles.json"), rng=seeds.spawn(1)[0])
+        self.location_generator = LocationNameGenerator(
+            os.path.join(data_dir, LOCATION_DATA_NAME),
+            os.path.join(data_dir, "fantasy_locations_history.json"),
+            rng=seeds.spawn(1)[0],
+        )
+        self.location_generator.history.close()  # the API never saves names
+        # One worker: the generators share random sources, and Python threads would not run handlers in parallel anyway
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ttrpg-api")
+        self.routes = {
+            "/": self.handle_index,
+            "/roll": self.handle_roll,
+            "/odds": self.handle_odds,
+            "/names": self.handle_names,
+            "/titles": self.handle_titles,
+            "/locations": self.handle_locations,
+            "/races": self.handle_races,
+            "/terrains": self.handle_terrains,
+        }
+
+    def handle_index(self, request):
+        return {"endpoints": sorted(path for path in self.routes if path != "/")}
+
+    def handle_roll(self, request):
+        compiled = self.dice.compile_expression(request.require("expression"))
+        count = request.count()
+        if request.flag("detail"):
+            dice_per_roll = sum(term.count for term in compiled.terms if isinstance(term, self.dice.DiceTerm))
+            if count * dice_per_roll > MAX_DETAIL_DICE:
+                raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                f"Detailed rolls are limited to {MAX_DETAIL_DICE} dice in total. Lower count or drop detail.")
+            return {"expression": compiled.expression, "results": [compiled.roll(self.dice_rng).to_dict() for _ in range(count)]}
+        totals = self.dice.roll_many(compiled, count, self.dice_rng)
+        return {"expression": compiled.expression, "totals": list(map(int, totals))}
+
+    def handle_odds(self, request):
+        expression = request.require("expression")
+        if self.dice.distribution_cost(expression) > MAX_ODDS_COST:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Too many possible totals to compute exact odds. Use fewer dice or sides.")
+        distribution = self.dice.distribution(expression)
+        try:
+            dcs = [int(dc) for dc in request.params.get("dc", [])]
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "dc must be a whole number.") from None
+        return {
+            "expression": self.dice.compile_expression(expression).expression,
+            "minimum": distribution.minimum,
+            "maximum": distribution.maximum,
+            "mean": distribution.mean(),
+            "stddev": distribution.stddev(),
+            "percentiles": {str(q): distribution.percentile(q) for q in (10, 25, 50, 75, 90)},
+            "at_least": {str(dc): distribution.prob_at_least(dc) for dc in dcs},
+        }
+
+    def handle_names(self, request):
+        race = request.require("race")
+        count = request.count()
+        generator = self.name_generator
+        if request.flag("unique"):
+            names = list(generator.iter_unique_names(race, count))
+        else:
+            names = list(generator.iter_names(race, count))
+        return {"race": race.lower(), "names": names}
+
+    def handle_titles(self, request):
+        complexity = request.get("complexity", "simple").lower()
+        sentiment = request.get("sentiment", "positive").lower()
+        count = request.count()
+        generator = self.title_generator
+        if (complexity, sentiment) not in generator.tables:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Choose complexity 'simple' or 'complex' and sentiment 'positive' or 'negative'.")
+        if request.flag("unique"):
+            titles = list(generator.iter_unique_titles(complexity, sentiment, count))
+        else:
+            titles = [generator.generate_title(complexity, sentiment) for _ in range(count)]
+        return {"complexity": complexity, "sentiment": sentiment, "titles": titles}
+
+    def handle_locations(self, request):
+        terrain = request.get("terrain")
+        count = request.count()
+        generator = self.location_generator
+        if terrain and terrain not in generator.tables.terrain:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown terrain '{terrain}'. Choose from: {', '.join(generator.tables.terrain_categories)}.")
+        if request.flag("unique"):
+            locations = list(generator.iter_unique_location_names(terrain, count))
+        else:
+            locations = [generator.generate_location_name(terrain) for _ in range(count)]
+        return {"terrain": terrain, "locations": locations}
+
+    def handle_races(self, request):
+        return {"races": self.name_generator.get_available_races()}
+
+    def handle_terrains(self, request):
+        return {"terrains": list(self.location_generator.tables.terrain_categories)}
+
+    def respond(self, request):
+        """Return (status, body) for a request"""
+        handler = self.routes.get(request.path)
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, {"error": f"No endpoint at {request.path}."}
+        if request.method not in ("GET", "HEAD"):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Only GET requests are supported."}
+        try:
+            return HTTPStatus.OK, handler(request)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+
+    async def read_request(self, reader):
+        """Read one request's head, or return None if the client closed the connection"""
+        line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        while line in (b"\r\n", b"\n"):  # tolerate blank lines between requests
+            line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line.") from None
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers.")
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length header.")
+        if length:
+            await reader.readexactly(length)  # bodies are ignored, but must be consumed
+        return Request(method, target, version, headers)
+
+    @staticmethod
+    def write_response(writer, status, body, keep_alive, head_only=False):
+        payload = json.dumps(body).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode("latin-1"))
+        if not head_only:
+            writer.write(payload)
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until it closes or goes idle"""
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HTTPError as e:
+                    self.write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                status, body = await asyncio.get_running_loop().run_in_executor(self.executor, self.respond, request)
+                self.write_response(writer, status, body, request.keep_alive, head_only=request.method == "HEAD")
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        """Accept connections until cancelled"""
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        addresses = ", ".join(f"http://{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+        print(f"Serving the TTRPG tools on {addresses}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run(host="127.0.0.1", port=8000, data_dir="data", seed=None):
+    """Load the generators and serve them until interrupted"""
+    server = GeneratorServer(data_dir, seed)
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        print("Server stopped.")
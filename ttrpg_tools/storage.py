@@ -0,0 +1,161 @@
+import gzip
+import json
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+
+from ttrpg_tools.instrument import count, timed
+
+
+@lru_cache(maxsize=None)
+def msgpack_module():
+    """Import msgpack on first use (it is only needed for .msgpack files)"""
+    try:
+        import msgpack
+    except ImportError:
+        raise RuntimeError("The msgpack package is required for .msgpack data files.") from None
+    return msgpack
+
+
+def detect_format(path):
+    """Return 'json', 'json.gz' or 'msgpack' based on the file name"""
+    name = str(path).lower()
+    if name.endswith((".json.gz", ".jsonz")):
+        return "json.gz"
+    if name.endswith((".msgpack", ".mpk")):
+        return "msgpack"
+    return "json"
+
+
+def encode_data(data, fmt="json"):
+    """Serialize data to bytes in the given format"""
+    if fmt == "json":
+        return json.dumps(data, indent=2).encode("utf-8")
+    if fmt == "json.gz":
+        compact = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        return gzip.compress(compact, mtime=0)
+    if fmt == "msgpack":
+        return msgpack_module().packb(data, use_bin_type=True)
+    raise ValueError(f"Unknown data format '{fmt}'.")
+
+
+def decode_data(payload, fmt="json"):
+    """Deserialize bytes produced by encode_data"""
+    if fmt == "json":
+        return json.loads(payload.decode("utf-8"))
+    if fmt == "json.gz":
+        return json.loads(gzip.decompress(payload).decode("utf-8"))
+    if fmt == "msgpack":
+        return msgpack_module().unpackb(payload, raw=False)
+    raise ValueError(f"Unknown data format '{fmt}'.")
+
+
+@timed("storage.load_data")
+def load_data(path):
+    """Read and parse a data file, picking the format from its name"""
+    with open(path, 'rb') as file:
+        return decode_data(file.read(), detect_format(path))
+
+
+@lru_cache(maxsize=None)
+def default_file_mode():
+    """Permissions open() would give a new file under the process umask"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def file_mode(path):
+    """Permission bits for a rewrite of path: the existing file's, else the default"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return default_file_mode()
+
+
+@timed("storage.write_atomic")
+def write_atomic(path, payload):
+    """Write bytes to path so readers only ever see the old or the new file.
+
+    The payload goes to a temporary file in the same directory, is fsynced,
+    and then renamed over the destination. The file keeps the destination's
+    permissions (or gets the usual umask-based ones if it is new), rather
+    than the owner-only mode mkstemp creates temporary files with.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_directory(directory)
+    count("storage.files_written")
+    count("storage.bytes_written", len(payload))
+    return len(payload)
+
+
+def _fsync_directory(directory):
+    """Persist the rename itself where the platform allows it"""
+    if os.name != "posix":
+        return
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def save_data(data, path):
+    """Atomically write data to path in the format implied by its name, returning bytes written"""
+    return write_atomic(path, encode_data(data, detect_format(path)))
+
+
+class DeferredSaves:
+    """Mixin that lets several mutations share a single save.
+
+    Inside `with obj.batch():` save methods that call defer_save only record
+    that they are needed; each runs once when the outermost batch exits
+    without an error.
+    """
+    _batch_depth = 0
+    _pending_saves = None
+
+    @contextmanager
+    def batch(self):
+        """Defer saves until the end of the block, then save once"""
+        if not self._batch_depth:
+            self._pending_saves = {}
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._pending_saves = None
+            raise
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            pending, self._pending_saves = self._pending_saves, None
+            for save in pending.values():
+                save()
+
+    def defer_save(self, save):
+        """Return True (and remember save) if a batch is open, else False"""
+        if not self._batch_depth:
+            return False
+        self._pending_saves[save.__name__] = save
+        return True
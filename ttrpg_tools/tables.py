@@ -0,0 +1,133 @@
+"""Compiled sampling tables for generator components.
+
+A component in the data files is either a plain string or a dict with a
+relative weight, e.g. {"text": "the Magnificent", "weight": 0.2}; plain
+strings have weight 1. Tables whose weights are all equal draw with
+rng.choice as before, otherwise they compile a Walker alias table at load
+so a weighted draw still costs one random number and one comparison.
+"""
+from itertools import repeat
+
+
+def component_text(entry):
+    """Text of a component (a string or {"text": ..., "weight": ...})"""
+    return entry["text"] if isinstance(entry, dict) else entry
+
+
+def component_weight(entry):
+    """Relative weight of a component (1 unless given)"""
+    return float(entry.get("weight", 1)) if isinstance(entry, dict) else 1.0
+
+
+def parse_component(text):
+    """Parse user input such as 'the Great' or 'the Great:5' into a component"""
+    text = text.strip()
+    name, separator, weight = text.rpartition(":")
+    if separator and name.strip():
+        try:
+            weight = float(weight)
+        except ValueError:
+            return text
+        if weight > 0:
+            return {"text": name.strip(), "weight": weight} if weight != 1 else name.strip()
+    return text
+
+
+def format_component(entry):
+    """Component for display: the text, with its weight if it has one"""
+    if isinstance(entry, dict) and "weight" in entry:
+        return f"{entry['text']} (weight {entry['weight']:g})"
+    return component_text(entry)
+
+
+def build_alias_table(weights):
+    """Walker alias table (Vose's method) for the weights.
+
+    Returns (probability, alias): column i is kept with probability[i] and
+    otherwise replaced by alias[i], so every column holds the same share of
+    the total weight.
+    """
+    count = len(weights)
+    total = sum(weights)
+    if total <= 0 or min(weights) < 0:
+        raise ValueError("Component weights must be non-negative with a positive total.")
+    scaled = [weight * count / total for weight in weights]
+    probability = [1.0] * count
+    alias = list(range(count))
+    small = [i for i, weight in enumerate(scaled) if weight < 1]
+    large = [i for i, weight in enumerate(scaled) if weight >= 1]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        probability[less] = scaled[less]
+        alias[less] = more
+        scaled[more] -= 1 - scaled[less]
+        (small if scaled[more] < 1 else large).append(more)
+    # Anything left over is 1 up to rounding error and keeps probability 1
+    return tuple(probability), tuple(alias)
+
+
+class SamplingTable:
+    """Immutable, tuple-backed list of components with O(1) draws, uniform or weighted"""
+    __slots__ = ("items", "weights", "probability", "aliased")
+
+    def __init__(self, entries):
+        entries = tuple(entries)
+        self.items = tuple(map(component_text, entries))
+        self.weights = tuple(map(component_weight, entries))
+        if len(set(self.weights)) > 1:
+            self.probability, alias = build_alias_table(self.weights)
+            self.aliased = tuple(self.items[i] for i in alias)
+        else:
+            self.probability = self.aliased = None  # uniform
+
+    def __len__(self):
+        return len(self.items)
+
+    def extended(self, entries):
+        """A new table with entries appended, keeping the existing weights"""
+        existing = ({"text": text, "weight": weight} for text, weight in zip(self.items, self.weights))
+        return SamplingTable((*existing, *entries))
+
+    def draw(self, rng):
+        """Draw one item"""
+        if self.probability is None:
+            return rng.choice(self.items)
+        column = rng.random() * len(self.items)
+        index = int(column)
+        if column - index < self.probability[index]:
+            return self.items[index]
+        return self.aliased[index]
+
+    def draw_many(self, rng, k):
+        """Draw k items in a single batch"""
+        if self.probability is None:
+            return rng.choices(self.items, k=k)
+        items, aliased, probability = self.items, self.aliased, self.probability
+        size = len(items)
+        random = rng.random
+        drawn = []
+        append = drawn.append
+        for _ in repeat(None, k):
+            column = random() * size
+            index = int(column)
+            append(items[index] if column - index < probability[index] else aliased[index])
+        return drawn
+
+
+class GroupedTable:
+    """Pick a group uniformly, then an item from that group"""
+    __slots__ = ("groups",)
+
+    def __init__(self, groups):
+        self.groups = tuple(SamplingTable(items) for items in groups if items)
+
+    def __len__(self):
+        return sum(map(len, self.groups))
+
+    def draw(self, rng):
+        """Draw one item"""
+        return rng.choice(self.groups).draw(rng)
+
+    def draw_many(self, rng, k):
+        """Draw k items in a single batch"""
+        return [group.draw(rng) for group in rng.choices(self.groups, k=k)]
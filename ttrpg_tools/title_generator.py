@@ -1,35 +1,91 @@
-import random
-import json
-import os
+from ttrpg_tools.instrument import timed
+from ttrpg_tools.permutation import distinct, iter_unique_combinations, unique_capacity
+from ttrpg_tools.registry import registry
+from ttrpg_tools.rng import make_rng
+from ttrpg_tools.storage import DeferredSaves, save_data
+from ttrpg_tools.tables import SamplingTable
 
 
-class TitleGenerator:
-    def __init__(self, data_file="data/fantasy_titles.json"):
+COMPLEX_PARTS = {
+    "positive": ("prefixes", "locations"),
+    "negative": ("prefixes", "creations", "origins"),
+}
+
+
+def compile_title_tables(title_data):
+    """Compile title data into {(complexity, sentiment): (SamplingTable, ...)}"""
+    tables = {}
+    for sentiment, components in title_data.get("simple", {}).items():
+        tables[("simple", sentiment)] = (SamplingTable(components),)
+    for sentiment, components in title_data.get("complex", {}).items():
+        parts = COMPLEX_PARTS.get(sentiment, tuple(components))
+        tables[("complex", sentiment)] = tuple(SamplingTable(components.get(part, ())) for part in parts)
+    return tables
+
+
+@timed("titles.draw_titles")
+def draw_titles(parts, rng, count):
+    """Draw count titles from a tuple of part tables, drawing each part in one batch"""
+    return list(map(" ".join, zip(*(part.draw_many(rng, count) for part in parts))))
+
+
+class TitleGenerator(DeferredSaves):
+    def __init__(self, data_file="data/fantasy_titles.json", rng=None):
         self.data_file = data_file
+        self.rng = make_rng(rng)
         self.title_data = {}
+        self.tables = {}
         self.load_title_data()
 
 
+    @timed("titles.load_title_data")
     def load_title_data(self):
         """Load title data from the JSON file"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as file:
-                    self.title_data = json.load(file)
-                print(f"Successfully loaded title data from {self.data_file}")
+            title_data, loaded = registry.load(self.data_file)
+            if title_data is not None:
+                self.title_data = title_data
+                self.tables = registry.derived(self.data_file, "title_tables", compile_title_tables)
+                if loaded:
+                    print(f"Successfully loaded title data from {self.data_file}")
                 
             else:
                 print(f"Data file {self.data_file} not found. Creating with default title components.")
                 self.create_default_title_data()
+                self.compile_tables()
                 self.save_title_data()
                 
         except Exception as e:
             print(f"Error loading title data: {e}")
             print("Creating default title data instead.")
             self.create_default_title_data()
+            self.compile_tables()
             self.save_title_data()
 
 
+    def compile_tables(self, complexity=None, sentiment=None):
+        """Rebuild the sampling tables, or only one (complexity, sentiment) table"""
+        if complexity is None:
+            self.tables = compile_title_tables(self.title_data)
+        else:
+            self.tables.update(compile_title_tables({complexity: {sentiment: self.title_data[complexity][sentiment]}}))
+
+
+    def extend_tables(self, complexity, sentiment, component_type, new_components):
+        """Append new components to the one compiled table they belong to"""
+        parts = self.tables.get((complexity, sentiment))
+        if complexity == "simple":
+            index = 0
+        elif component_type in COMPLEX_PARTS.get(sentiment, ()):
+            index = COMPLEX_PARTS[sentiment].index(component_type)
+        else:
+            index = None
+        if parts is None or index is None:
+            self.compile_tables(complexity, sentiment)
+            return
+        self.tables[(complexity, sentiment)] = parts[:index] + (parts[index].extended(new_components),) + parts[index + 1:]
+
+
     def create_default_title_data(self):
         """Create default title components if no file exists"""
         self.title_data = {
@@ -84,11 +140,15 @@ class TitleGenerator:
         }
 
 
+    @timed("titles.save_title_data")
     def save_title_data(self):
         """Save the current title data to the JSON file"""
+        if self.defer_save(self.save_title_data):
+            return
+        
         try:
-            with open(self.data_file, 'w') as file:
-                json.dump(self.title_data, file, indent=2)
+            save_data(self.title_data, self.data_file)
+            registry.store(self.data_file, self.title_data)
             print(f"Successfully saved title data to {self.data_file}")
             
         except Exception as e:
@@ -97,30 +157,24 @@ class TitleGenerator:
 
     def generate_simple_title(self, sentiment):
         """Generate a simple title with the specified sentiment"""
-        if sentiment.lower() not in ["positive", "negative"]:
+        parts = self.tables.get(("simple", sentiment)) or self.tables.get(("simple", sentiment.lower()))
+        if parts is None:
             return f"Invalid sentiment. Choose 'positive' or 'negative'."
         
-        return random.choice(self.title_data["simple"][sentiment.lower()])
+        return parts[0].draw(self.rng)
 
 
     def generate_complex_title(self, sentiment):
         """Generate a complex title with the specified sentiment"""
-        if sentiment.lower() not in ["positive", "negative"]:
+        parts = self.tables.get(("complex", sentiment)) or self.tables.get(("complex", sentiment.lower()))
+        if parts is None:
             return f"Invalid sentiment. Choose 'positive' or 'negative'."
         
-        sentiment = sentiment.lower()
-        if sentiment == "positive":
-            prefix = random.choice(self.title_data["complex"][sentiment]["prefixes"])
-            location = random.choice(self.title_data["complex"][sentiment]["locations"])
-            return f"{prefix} {location}"
-        
-        else:
-            prefix = random.choice(self.title_data["complex"][sentiment]["prefixes"])
-            creation = random.choice(self.title_data["complex"][sentiment]["creations"])
-            origin = random.choice(self.title_data["complex"][sentiment]["origins"])
-            return f"{prefix} {creation} {origin}"
+        rng = self.rng
+        return " ".join([part.draw(rng) for part in parts])
 
 
+    @timed("titles.generate_title")
     def generate_title(self, complexity, sentiment):
         """Generate a title with the specified complexity and sentiment"""
         if complexity.lower() == "simple":
@@ -133,6 +187,38 @@ class TitleGenerator:
             return f"Invalid complexity. Choose 'simple' or 'complex'."
 
 
+    @timed("titles.generate_multiple_titles")
+    def generate_multiple_titles(self, complexity, sentiment, count=5):
+        """Generate multiple titles, drawing each part of the title in one batch"""
+        parts = self.tables.get((complexity.lower(), sentiment.lower()))
+        if parts is None:
+            return [self.generate_title(complexity, sentiment)] * count
+        return draw_titles(parts, self.rng, count)
+
+
+    def unique_title_parts(self, complexity, sentiment):
+        """Distinct components of each part of a title, used for unique generation"""
+        parts = self.tables.get((complexity.lower(), sentiment.lower()))
+        if parts is None:
+            raise ValueError(f"Invalid complexity or sentiment: '{complexity}', '{sentiment}'.")
+        return tuple(distinct(part.items) for part in parts)
+
+
+    def unique_title_capacity(self, complexity, sentiment):
+        """How many component combinations the complexity and sentiment have (at most this many unique titles)"""
+        return unique_capacity(self.unique_title_parts(complexity, sentiment))
+
+
+    def iter_unique_titles(self, complexity, sentiment, count=None):
+        """Iterator over titles that never repeat.
+
+        Raises ValueError right away for an unknown complexity or sentiment,
+        a negative count or a count above unique_title_capacity();
+        count=None yields every combination.
+        """
+        return iter_unique_combinations(self.unique_title_parts(complexity, sentiment), self.rng, count, " ".join)
+
+
     def add_title_component(self, complexity, sentiment, component_type, new_components):
         """Add new title components"""
         complexity = complexity.lower()
@@ -163,5 +249,6 @@ class TitleGenerator:
             else:
                 return f"Invalid component type for {sentiment} {complexity} titles."
         
+        self.extend_tables(complexity, sentiment, component_type, new_components)
         self.save_title_data()
         return f"Added new {component_type} to {sentiment} {complexity} titles."
\ No newline at end of file